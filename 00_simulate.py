@@ -1,36 +1,49 @@
 import argparse
+import os
 import yaml 
-import pandas as pd
-import matplotlib.pyplot as plt
 from tqdm import tqdm
 
 
-from agents.agent_groups import RandomAgentGroup
-from orderbook.bounded_order_book import BoundedOrderBook 
+from simulation.simulator import create_simulation, simulate_blocks
+from simulation.ensemble import simulate_ensemble
+from simulation.checkpoint import checkpoint_path, save_checkpoint, load_checkpoint
+from datasets.prices import PriceWriter, read_price_array
+from utils.plotting import plot_prices
 
 
-def main(config: dict, output_path:str): 
-    order_book = BoundedOrderBook(**config['ORDER_BOOK'])
-    agent_group = RandomAgentGroup(order_book, **config['AGENT_GROUP'])
+def main(config: dict, output_path:str, plot_path:str = None, resume: bool = False): 
+    n_steps = config['SIMULATOR']['n_steps']
+    block_size = config['SIMULATOR'].get('block_size', 100_000)
+    checkpoint_every = config['SIMULATOR'].get('checkpoint_every', None)
+    ckpt_path = checkpoint_path(output_path)
 
-    data = []
+    if resume and os.path.exists(ckpt_path):
+        checkpoint = load_checkpoint(ckpt_path)
+        agent_group = checkpoint['agent_group']
+        start = checkpoint['step']
+        writer = PriceWriter(output_path, n_steps, resume=checkpoint['output'])
+    else:
+        agent_group = create_simulation(config)
+        start = 0
+        # Prices are streamed to the output one block at a time 
+        writer = PriceWriter(output_path, n_steps, metadata={'config': config, 'seed': config['AGENT_GROUP']['seed']})
 
-    for t in tqdm(range(config['SIMULATOR']['n_steps'])):
-        # for n_steps, 
-        price = round(agent_group.post_price(),2)
-        data.append((t, price))
-        
-    
-    data = pd.DataFrame(data, columns = ['t', 'price'])
-    data.to_csv(output_path, index = False)
+    last_checkpoint = start
+    blocks = simulate_blocks(agent_group, config['SIMULATOR'], start)
+    for block_start, block in tqdm(blocks, initial=start // block_size, total=-(-n_steps // block_size)):
+        writer.write(block_start, block)
+
+        # Checkpoints are only taken between blocks, so a resumed run draws exactly the same blocks 
+        step = block_start + block.size
+        if checkpoint_every is not None and step - last_checkpoint >= checkpoint_every and step < n_steps:
+            save_checkpoint(ckpt_path, step, agent_group, writer.flush())
+            last_checkpoint = step
+    writer.close()
 
+    if os.path.exists(ckpt_path):
+        os.remove(ckpt_path)
 
-    plt.figure()
-    plt.plot(data['t'], data['price'])
-    plt.xlabel('t')
-    plt.ylabel('price')
-    plt.title('Price Over Time')
-    plt.show()
+    plot_prices(read_price_array(output_path), plot_path)
 
 
 if __name__ == "__main__":
@@ -40,6 +53,10 @@ if __name__ == "__main__":
     )
     parser.add_argument("-c", "--config", required=True)
     parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("-n", "--n_paths", type=int, default=None, help="Simulates an ensemble of independent paths into a .npy file.")
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    parser.add_argument("-p", "--plot", default=None, help="Writes the price plot to this image instead of showing it.")
+    parser.add_argument("--resume", action="store_true", help="Continues from the last checkpoint of this output.")
     
 
     args = vars(parser.parse_args()) 
@@ -53,5 +70,8 @@ if __name__ == "__main__":
             print(e)
     
     output_path = args["output"]
-    main(config, output_path)
-
+    if args["n_paths"] is not None:
+        paths = simulate_ensemble(config, output_path, args["n_paths"], args["workers"])
+        plot_prices(paths, args["plot"])
+    else:
+        main(config, output_path, args["plot"], args["resume"])
@@ -1,21 +1,107 @@
 import argparse
+
 import pandas as pd
 
+from features.features import VolatilityFeatures, ChunkedVolatilityFeatures
+from features.cache import FeatureCache, DEFAULT_CACHE_DIR
+from datasets.prices import read_prices, iter_prices
+from datasets.feature_store import FeatureStoreWriter, is_feature_store
+
+
+def iter_minute_bars(file_path: str, chunksize: int):
+    # Minute bars of a tick file read chunksize ticks at a time. The last bar of a chunk can continue in the next one, 
+    # so its ticks are carried over and the bar is only emitted once a later minute starts. 
+    carry = None
+    for chunk in iter_prices(file_path, chunksize):
+        data = chunk if carry is None else pd.concat([carry, chunk], ignore_index=True)
+        minutes = data['t'] // 60
+        complete = minutes < minutes.iloc[-1]
+        carry = data[~complete]
+
+        bars = data[complete].assign(t=minutes[complete])
+        yield bars.groupby('t')['price'].last().reset_index()
 
-from features.features import VolatilityFeatures
+    if carry is not None:
+        yield carry.assign(t=carry['t'] // 60).groupby('t')['price'].last().reset_index()
 
 
-def main(file_path: str, output_path:str): 
-    data = pd.read_csv(file_path)
+def iter_bars(data: pd.DataFrame, bar_sizes: list):
+    # (bar size, bars) for bar sizes in ticks, finest first. The finest bars are aggregated from the ticks once, 
+    # and every coarser bar size, which must be a multiple of the finest, from the finest bars. 
+    bar_sizes = sorted(bar_sizes)
+    finest = bar_sizes[0]
+    bars = data.assign(t=data['t'] // finest).groupby('t')['price'].last().reset_index()
+    for bar_size in bar_sizes:
+        if bar_size % finest != 0:
+            raise ValueError(f"Bar size {bar_size} is not a multiple of the finest bar size {finest}.")
+        # The finest bar t covers ticks [t*finest, (t+1)*finest), all inside coarser bar t*finest // bar_size 
+        yield bar_size, bars.assign(t=bars['t'] * finest // bar_size).groupby('t')['price'].last().reset_index()
 
-    # For changing to minutes instead of second level 
-    data['t'] = data['t'] // 60
-    data = data.groupby('t')['price'].last().reset_index()
 
+def make_resolution_features(data: pd.DataFrame, bar_sizes: list, horizons: list):
+    # Features of every (bar size, horizon) pair from one read of the ticks, keyed by bar and horizon columns. 
+    # Horizons are in bars of each bar size. 
     volatility_features = VolatilityFeatures()
+    features = [volatility_features.make_horizon_features(bars, horizons) for bar_size, bars in iter_bars(data, bar_sizes)]
+    return pd.concat(features, keys=sorted(bar_sizes), names=['bar', None]).reset_index(level='bar')
+
+
+def write_features(chunks, output_path: str, dtype: str = None):
+    # Writes consecutive feature frames to a CSV file, or to a columnar feature store for output paths ending in .store 
+    if is_feature_store(output_path):
+        writer = FeatureStoreWriter(output_path, dtype)
+        for features_data in chunks:
+            writer.write(features_data)
+        writer.close()
+        return
+
+    header = True
+    with open(output_path, "w", newline="") as file:
+        for features_data in chunks:
+            features_data.to_csv(file, header=header, index=False)
+            header = False
+
 
-    features_data = volatility_features.make_features(data, horizon=60)
-    features_data.to_csv(output_path, index = False)
+def main(file_path: str, output_path:str, chunksize: int = None, bar_sizes: list = None, horizons: list = None,
+         cache_dir: str = DEFAULT_CACHE_DIR, dtype: str = None): 
+    multi_resolution = bar_sizes is not None or horizons is not None
+    bar_sizes = sorted(bar_sizes or [60])
+    horizons = horizons or [60]
+
+    cache = None
+    if cache_dir is not None:
+        # Keyed by the input contents, so re-running on an unchanged input loads the features instead of recomputing them. 
+        # The chunked and in-memory runs have the same output and share entries. 
+        cache = FeatureCache(cache_dir)
+        params = {"bar_sizes": bar_sizes, "horizons": horizons, "lag": 4, "keyed": multi_resolution}
+        key = cache.key(cache.file_hash(file_path), **params)
+        features_data = cache.load(key)
+        if features_data is not None:
+            write_features([features_data], output_path, dtype)
+            return
+
+    if multi_resolution:
+        features_data = make_resolution_features(read_prices(file_path), bar_sizes, horizons)
+    elif chunksize is not None:
+        # Out-of-core: memory depends on chunksize and the feature lookback, not on the length of the series, 
+        # so the output is not kept in memory for the cache either 
+        volatility_features = ChunkedVolatilityFeatures(horizon=60)
+        write_features(volatility_features.make_features(iter_minute_bars(file_path, chunksize)), output_path, dtype)
+        return
+    else:
+        data = read_prices(file_path)
+
+        # For changing to minutes instead of second level 
+        data['t'] = data['t'] // 60
+        data = data.groupby('t')['price'].last().reset_index()
+
+        volatility_features = VolatilityFeatures()
+
+        features_data = volatility_features.make_features(data, horizon=60)
+
+    write_features([features_data], output_path, dtype)
+    if cache is not None:
+        cache.store(key, features_data, input=file_path, **params)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -24,13 +110,25 @@ if __name__ == "__main__":
     )
     parser.add_argument("-i", "--input", required=True)
     parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("--chunksize", type=int, default=None, help="Ticks read at a time, reads the whole input at once if not set")
+    parser.add_argument("--bar_sizes", type=int, nargs="+", default=None, help="Bar sizes in ticks, for features at several resolutions")
+    parser.add_argument("--horizons", type=int, nargs="+", default=None, help="Horizons in bars, for features at several resolutions")
+    parser.add_argument("--cache_dir", default=DEFAULT_CACHE_DIR, help="Feature cache, see python -m features.cache")
+    parser.add_argument("--no_cache", action="store_true", help="Always recompute the features")
+    parser.add_argument("--dtype", default=None, choices=["float32", "float64"], help="Precision of the feature store columns")
     
 
     args = vars(parser.parse_args()) 
 
     file_path = args["input"] 
     output_path = args["output"]
+    chunksize = args["chunksize"]
+    bar_sizes = args["bar_sizes"]
+    horizons = args["horizons"]
+    if chunksize is not None and (bar_sizes is not None or horizons is not None):
+        parser.error("--chunksize does not support --bar_sizes and --horizons")
+    cache_dir = None if args["no_cache"] else args["cache_dir"]
+    dtype = args["dtype"]
    
 
-    main(file_path, output_path)
-
+    main(file_path, output_path, chunksize, bar_sizes, horizons, cache_dir, dtype)
@@ -4,34 +4,172 @@ import json
 import pandas as pd
 import logging
 import os
-import pickle
+import copy
+import math
+import itertools
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
 
 from datasets.cross_validation import get_dataset_split
+from datasets.feature_store import is_feature_store, read_feature_store
 
-from datasets.preprocess import Preprocess
+from datasets.shared_frame import release_blocks
 
 from models.model import create_model, generate_grid
+from models.training import PreparedFolds, share_folds, train_fold, init_worker, train_fold_task, train_folds_task
 
 from metrics.regression_metrics import RegressionMetric
 
-from utils.runs import create_run, dict_to_str
+from utils.runs import create_run
+from utils.artifact_store import ArtifactStore
+from utils.results_store import ResultsStore, results_path
 from utils.logger import create_global_logger, create_logger
 import pprint
 
 # TODO: Make logging prettier...
 logger = create_global_logger(name = __name__, level = logging.DEBUG)
 
-def main(config:dict, hyperparameters:dict):
-    config["RESULTS"]["SAVE"] = False
-    
+@contextmanager
+def fold_runner(data_features: pd.DataFrame, data_target: pd.DataFrame, train_indices, test_indices,
+                prep_config: dict, save: bool, n_workers: int = 1):
+    # Yields a function that trains a list of (model, fold index) cells and returns their (y_hat, model, feat_prep, target_prep) 
+    # in the order of the cells. With several workers the cells run over a process pool that reads the prepared folds from shared memory. 
+    if n_workers <= 1:
+        folds = PreparedFolds(data_features, data_target, train_indices, test_indices, prep_config)
+
+        def run(cells: list):
+            for model, fold_idx in cells:
+                y_hat, feat_prep, target_prep = train_fold(model, folds[fold_idx])
+                # The model is trained again on its next fold while a saved copy may still be waiting to be pickled, 
+                # reset and train only rebind its attributes, so a shallow copy keeps this fold's fit 
+                yield y_hat, copy.copy(model), feat_prep, target_prep
+
+        yield run
+        return
+
+    # Folds are prepared once here and read by every worker from shared memory 
+    fold_blocks, fold_specs = share_folds(PreparedFolds(data_features, data_target, train_indices, test_indices, prep_config))
+    try:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=init_worker, initargs=(fold_specs, save)) as executor:
+
+            def run(cells: list):
+                if not any(model.warm_start for model, fold_idx in cells):
+                    yield from executor.map(train_fold_task, cells)
+                    return
+
+                # Warm started folds depend on the previous fold of the same model, so the consecutive folds of a model run 
+                # as one task, and the model continues from where its last fold left off 
+                groups = [(model, [fold_idx for model, fold_idx in group]) for model, group in itertools.groupby(cells, key=lambda cell: cell[0])]
+                for (model, fold_idxs), (results, start_params) in zip(groups, executor.map(train_folds_task, groups)):
+                    model.start_params = start_params
+                    yield from results
+
+            yield run
+    finally:
+        release_blocks(fold_blocks, unlink=True)
+
+
+def evaluate_models(run, models: list, fold_idxs, data_target: pd.DataFrame, test_indices, result_cfg: dict,
+                    run_logger, results_store: ResultsStore, artifact_store: ArtifactStore = None, cache: dict = None):
+    # Cross-validates every (algorithm_name, hp_cross_product, model) on the folds fold_idxs, logs one block per model, 
+    # adds it to the results store, saves the fitted models and preprocessing to artifact_store if given, 
+    # and returns the mean metrics of each model. Predictions found in cache, by model and fold, are reused instead of retrained, 
+    # and new ones are added to it. 
+    fold_idxs = list(fold_idxs)
+    cells = [(model, fold_idx) for algorithm_name, hp_cross_product, model in models for fold_idx in fold_idxs
+             if cache is None or (id(model), fold_idx) not in cache]
+    fold_results = iter(run(cells))
+
+    metric = RegressionMetric() 
+    mean_metrics = []
+    for algorithm_name, hp_cross_product, model in models:
+        logger_msg = "\n"+"#"*50+"\n"+algorithm_name+"\n"+pprint.pformat(hp_cross_product)
+
+        metric.reset() # Before starting on a new cross validation, reset the metric values.
+        for fold_idx in fold_idxs:
+            if cache is not None and (id(model), fold_idx) in cache:
+                y_hat = cache[(id(model), fold_idx)]
+            else:
+                y_hat, fitted_model, feat_prep, target_prep = next(fold_results)
+                if cache is not None:
+                    cache[(id(model), fold_idx)] = y_hat
+                if artifact_store is not None:
+                    artifact_store.save(algorithm_name, hp_cross_product, fold_idx + 1,
+                                        model=fitted_model, feat_prep=feat_prep, target_prep=target_prep)
+            y_test = data_target.iloc[test_indices[fold_idx]]
+                
+            results = metric.update(y_test, y_hat)
+
+            if result_cfg["VERBOSE"] >= 1:
+                logger_msg += "\n\n"+"-"*50+"\nFOLD {0}\n".format(fold_idx+1)+pprint.pformat(results)+"\n"+"-"*50
+                    
+        logger_msg += "\n\nMEAN\n"+pprint.pformat(metric.mean())+"\n\nSTDEV\n"+pprint.pformat(metric.stdev())+"\n"
+        logger_msg += "#"*50
+        run_logger.info(logger_msg)
+        results_store.add(algorithm_name, hp_cross_product, [fold_idx+1 for fold_idx in fold_idxs], metric.scores, metric.mean(), metric.stdev())
+        results_store.commit()
+        mean_metrics.append(metric.mean())
+    return mean_metrics
+
+
+def halving_params(search_cfg: dict):
+    # MIN_FOLDS and FACTOR of a Halving search, checked so every round scores more folds than the previous one 
+    min_folds = search_cfg.get("MIN_FOLDS", 2)
+    factor = search_cfg.get("FACTOR", 3)
+    if not isinstance(min_folds, int) or min_folds < 1:
+        raise ValueError(f"SEARCH MIN_FOLDS must be an integer of at least 1, got {min_folds}.")
+    if not isinstance(factor, int) or factor <= 1:
+        raise ValueError(f"SEARCH FACTOR must be an integer greater than 1, got {factor}.")
+    return min_folds, factor
+
+
+def successive_halving(models: list, n_folds: int, search_cfg: dict, evaluate, run_logger):
+    # Scores every configuration on the first MIN_FOLDS folds, keeps the best 1/FACTOR of each algorithm by mean_absolute_error, 
+    # and scores the survivors on FACTOR times more folds, until the last survivors are scored on every fold. 
+    # Folds scored in a previous round are not retrained, so each configuration costs the folds of its last round. 
+    min_folds, factor = halving_params(search_cfg)
+
+    cache = {}
+    candidates = models
+    n_round_folds = min(min_folds, n_folds)
+    round_idx = 1
+    while True:
+        run_logger.info("\nSUCCESSIVE HALVING ROUND {0}: {1} configurations on {2} of {3} folds".format(
+            round_idx, len(candidates), n_round_folds, n_folds))
+        mean_metrics = evaluate(candidates, range(n_round_folds), cache)
+        if n_round_folds == n_folds:
+            return
+
+        kept = []
+        for algorithm_name in dict.fromkeys(candidate[0] for candidate in candidates):
+            scores = [(metrics["mean_absolute_error"], i) for i, (candidate, metrics) in enumerate(zip(candidates, mean_metrics))
+                      if candidate[0] == algorithm_name]
+            kept += [i for score, i in sorted(scores)[:max(1, math.ceil(len(scores) / factor))]]
+        candidates = [candidates[i] for i in sorted(kept)]
+
+        # Predictions of the eliminated configurations are not needed anymore 
+        survivors = {id(model) for algorithm_name, hp_cross_product, model in candidates}
+        cache = {key: y_hat for key, y_hat in cache.items() if key[0] in survivors}
+        n_round_folds = min(n_round_folds * factor, n_folds)
+        round_idx += 1
+
+
+def main(config:dict, hyperparameters:dict, n_workers: int = 1, save: bool = False):
+    # Models and preprocessing are only saved when asked for with --save 
+    config["RESULTS"]["SAVE"] = save
+
     data_cfg = config["DATA"] 
     data_cfg["SEED"] = config["SEED"] 
 
     prep_config = config["PREPROCESSING"]
     prep_config["SEED"] = config["SEED"]
 
-    data = pd.read_csv(data_cfg["DATA_PATH"])
-    data = data[data_cfg["FEATURES"] + [data_cfg["TARGET"]]]
+    if is_feature_store(data_cfg["DATA_PATH"]):
+        # Memory-maps only the configured columns, optionally as DTYPE 
+        data = read_feature_store(data_cfg["DATA_PATH"], data_cfg["FEATURES"] + [data_cfg["TARGET"]], data_cfg.get("DTYPE"))
+    else:
+        data = pd.read_csv(data_cfg["DATA_PATH"])
+        data = data[data_cfg["FEATURES"] + [data_cfg["TARGET"]]]
 
     data_features = data[data_cfg["FEATURES"]]
     data_target = data[[data_cfg["TARGET"]]] 
@@ -39,9 +177,24 @@ def main(config:dict, hyperparameters:dict):
 
     train_indices, test_indices = get_dataset_split(data_cfg, data_features, data_target)
 
-    feat_prep = Preprocess(prep_config["FEATURES"])
-    target_prep = Preprocess(prep_config["TARGET"])  
-
+    search_cfg = config.get("SEARCH", {"TYPE": "Grid"})
+    if search_cfg["TYPE"] == "Halving":
+        # Checked before the run is created, so an invalid search fails before any training 
+        halving_params(search_cfg)
+
+    # NOTE: Not using sklearn gridsearch to allow for custom pytorch gridsearch
+    # Models are created before the run, so an unsupported WARM_START or ONE_STEP fails before any training 
+    # Algorithms listed in WARM_START fit each fold starting from the parameters of the previous one 
+    warm_start = config.get("WARM_START", [])
+    # Algorithms listed in ONE_STEP are scored on forecasts of each test point from the targets up to DATA.HORIZON rows before it, 
+    # with their fitted parameters frozen. The horizon is the number of rows a target looks ahead, so it is required. 
+    one_step = config.get("ONE_STEP", [])
+    if one_step and "HORIZON" not in data_cfg:
+        raise ValueError("ONE_STEP needs DATA.HORIZON, the number of rows ahead the target is computed over.")
+    models = [(algorithm_name, hp_cross_product,
+               create_model(algorithm_name, hp_cross_product, seed=config["SEED"], warm_start=algorithm_name in warm_start,
+                            one_step=algorithm_name in one_step, horizon=data_cfg.get("HORIZON", 1)))
+              for algorithm_name in hyperparameters for hp_cross_product in generate_grid(hyperparameters[algorithm_name])]
 
     result_cfg = config["RESULTS"]
     folder_path = None
@@ -49,58 +202,27 @@ def main(config:dict, hyperparameters:dict):
     folder_path = create_run(result_cfg)
     run_logger = create_logger(os.path.join(folder_path, "log.txt"), name = __name__)
 
-    metric = RegressionMetric() 
-
     run_logger.info("\n"+pprint.pformat(config))
 
-    for algorithm_name in hyperparameters:
-        # NOTE: Not using sklearn gridsearch to allow for custom pytorch gridsearch
-        for hp_cross_product in generate_grid(hyperparameters[algorithm_name]):
-            model = create_model(algorithm_name, hp_cross_product, seed=config["SEED"])
-
-            logger_msg = "\n"+"#"*50+"\n"+algorithm_name+"\n"+pprint.pformat(hp_cross_product)
-
-            metric.reset() # Before starting on a new cross validation, reset the metric values.
-            for fold_idx, (train_idx, test_idx) in enumerate(zip(train_indices, test_indices)):
-                model.reset()
-                X_train = data_features.iloc[train_idx]
-                X_test = data_features.iloc[test_idx]
-
-                y_train = data_target.iloc[train_idx]
-                y_test = data_target.iloc[test_idx]
-  
-                X_train, X_test = feat_prep.transform_dataset(X_train, X_test, y_train)
-                y_train = target_prep.fit_transform(y_train)           
-
-                model.train(X_train, y_train)
-                y_hat = target_prep.inverse_transform(model(X_test))
-                
-                metric.update(y_test, y_hat)
-
-                if result_cfg["VERBOSE"] >= 1:
-                    results = metric(y_test, y_hat)
-                    logger_msg += "\n\n"+"-"*50+"\nFOLD {0}\n".format(fold_idx+1)+pprint.pformat(results)+"\n"+"-"*50
-
-                if result_cfg["SAVE"]:
-                    fold_folder = "fold_" + str(fold_idx + 1)
-
-                    file_name = algorithm_name + "_" + dict_to_str(hp_cross_product) + ".pkl"
-                    with open(os.path.join(folder_path, fold_folder, file_name), "wb") as file:
-                        pickle.dump(model, file)
-    
-                    feature_prep_path = os.path.join(folder_path, fold_folder, "feat_preprocess" + ".pkl")
-                    target_prep_path = os.path.join(folder_path, fold_folder, "target_prep" + ".pkl")
-                    # Only save the preprocessing once for each fold, since subsequent repetitions contain the same data.
-                    if not os.path.exists(feature_prep_path):
-                        with open(feature_prep_path, "wb") as file:
-                            pickle.dump(feat_prep, file)
-                    if not os.path.exists(target_prep_path):
-                        with open(target_prep_path, "wb") as file:
-                            pickle.dump(target_prep, file)
-                    
-            logger_msg += "\n\nMEAN\n"+pprint.pformat(metric.mean())+"\n\nSTDEV\n"+pprint.pformat(metric.stdev())+"\n"
-            logger_msg += "#"*50
-            run_logger.info(logger_msg)
+    # Every result is also stored as typed records, queried by 03_filter_log.py 
+    results_store = ResultsStore(results_path(folder_path), run=folder_path)
+    # Models and preprocessing are written by a background thread, deduplicated by content 
+    artifact_store = ArtifactStore(folder_path) if result_cfg["SAVE"] else None
+
+    with fold_runner(data_features, data_target, train_indices, test_indices, prep_config, result_cfg["SAVE"], n_workers) as run:
+        def evaluate(models: list, fold_idxs, cache: dict = None):
+            return evaluate_models(run, models, fold_idxs, data_target, test_indices, result_cfg, run_logger,
+                                   results_store, artifact_store, cache)
+
+        if search_cfg["TYPE"] == "Grid":
+            evaluate(models, range(len(test_indices)))
+        elif search_cfg["TYPE"] == "Halving":
+            successive_halving(models, len(test_indices), search_cfg, evaluate, run_logger)
+        else:
+            raise ValueError(f"Unknown search type {search_cfg['TYPE']}, expected Grid or Halving.")
+    results_store.close()
+    if artifact_store is not None:
+        artifact_store.close()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -109,6 +231,8 @@ if __name__ == "__main__":
     )
     parser.add_argument("-c", "--config", required=True)
     parser.add_argument("-p", "--hyperparameters", required=True)
+    parser.add_argument("-w", "--workers", type=int, default=1, help="Processes the (hyperparameters, fold) grid runs over")
+    parser.add_argument("--save", action="store_true", help="Saves the fitted models and preprocessing of every fold")
 
     args = vars(parser.parse_args()) 
 
@@ -123,4 +247,4 @@ if __name__ == "__main__":
     with open(hyperparameter_path, "r") as file:
         hyperparameters = json.load(file)
 
-    main(config, hyperparameters)
\ No newline at end of file
+    main(config, hyperparameters, args["workers"], args["save"])
\ No newline at end of file
@@ -2,6 +2,9 @@ import re
 import ast
 import pandas as pd
 import argparse 
+import os
+
+from utils.results_store import RESULTS_FILE, results_path, best_results, fold_results
 
 def read_multiline_dict(lines, start_index):
     dict_lines = []
@@ -100,31 +103,83 @@ def parse_log_file(filepath):
     return results
 
 
-def extract_best_per_algorithm(results_dict):
-    best_rows = []
+def fold_rows(algorithm: str, folds: list):
+    return [{
+        "algorithm": algorithm,
+        "fold": fold_data["fold"],
+        "mean_absolute_error": fold_data["mean_absolute_error"],
+        "mean_squared_error": fold_data["mean_squared_error"],
+        "r2": fold_data["r2"],
+        "max_error": fold_data["max_error"]
+    } for fold_data in folds]
 
+
+def best_configs(results_dict):
+    # Best configuration per algorithm of parsed logs, as (key, fold rows). Successive halving logs configurations on fewer folds 
+    # in early rounds, so the key orders by the most folds first, then the lowest mean_absolute_error 
+    best = {}
     for model_name, configs in results_dict.items():
         best_config = min(
             configs,
-            key=lambda x: x["mean_metrics"]["mean_absolute_error"]
+            key=lambda x: (-len(x["folds"]), x["mean_metrics"]["mean_absolute_error"])
         )
+        key = (-len(best_config["folds"]), best_config["mean_metrics"]["mean_absolute_error"])
+        best[model_name] = (key, fold_rows(model_name, best_config["folds"]))
+    return best
 
-        for fold_data in best_config["folds"]:
-            best_rows.append({
-                "algorithm": model_name,
-                "fold": fold_data["fold"],
-                "mean_absolute_error": fold_data["mean_absolute_error"],
-                "mean_squared_error": fold_data["mean_squared_error"],
-                "r2": fold_data["r2"],
-                "max_error": fold_data["max_error"]
-            })
 
+def extract_best_per_algorithm(results_dict):
+    best_rows = []
+    for key, rows in best_configs(results_dict).values():
+        best_rows += rows
     return pd.DataFrame(best_rows)
 
 
-def main(file_path:str, output_path:str):
-    parsed_results = parse_log_file(file_path)
-    best_df = extract_best_per_algorithm(parsed_results)
+def best_configs_from_store(store_path: str):
+    # Same as best_configs, queried from a results store 
+    best = {}
+    for result_id, algorithm, n_folds, mean_absolute_error in best_results(store_path):
+        best[algorithm] = ((-n_folds, mean_absolute_error), fold_rows(algorithm, fold_results(store_path, result_id)))
+    return best
+
+
+def store_path(path: str):
+    # Results store of a run directory, of its log.txt or the store itself, None for logs written without a store 
+    if os.path.isdir(path):
+        path = results_path(path)
+    elif not path.endswith(RESULTS_FILE):
+        path = results_path(os.path.dirname(path))
+    return path if os.path.exists(path) else None
+
+
+def log_path(path: str):
+    # log.txt of a run directory or of its results store, other paths are logs 
+    if os.path.isdir(path):
+        return os.path.join(path, "log.txt")
+    if path.endswith(RESULTS_FILE):
+        return os.path.join(os.path.dirname(path), "log.txt")
+    return path
+
+
+def main(file_paths: list, output_path:str):
+    # Each input is queried from its results store, or parsed from its log for runs written without one, and the best 
+    # configuration per algorithm is taken over all of them: the most folds first, then the lowest mean_absolute_error, 
+    # the first input on ties 
+    best = {}
+    for file_path in file_paths:
+        path = store_path(file_path)
+        if path is not None:
+            configs = best_configs_from_store(path)
+        else:
+            configs = best_configs(parse_log_file(log_path(file_path)))
+        for algorithm, (key, rows) in configs.items():
+            if algorithm not in best or key < best[algorithm][0]:
+                best[algorithm] = (key, rows)
+
+    best_rows = []
+    for key, rows in best.values():
+        best_rows += rows
+    best_df = pd.DataFrame(best_rows)
     best_df.to_csv(output_path, index=False)
 
 if __name__ == "__main__":
@@ -132,14 +187,13 @@ if __name__ == "__main__":
          prog = "filter_log.py",
          description = "Filters the log file for best folds"
     )
-    parser.add_argument("-i", "--input", required=True)
+    parser.add_argument("-i", "--input", required=True, nargs="+", help="Run directories, their log.txt or results.sqlite files")
     parser.add_argument("-o", "--output", required=True)
     
 
     args = vars(parser.parse_args()) 
 
-    file_path = args["input"]
+    file_paths = args["input"]
     output_path = args["output"]
 
-    main(file_path, output_path)
-
+    main(file_paths, output_path)
@@ -1,10 +1,81 @@
 import pandas as pd
 import numpy as np
-from itertools import combinations
 import argparse
 from scipy.stats import t
 
-def main(file_path: str, output_path: str, metric: str = "mean_absolute_error", alpha: float = 0.05):
+CORRECTIONS = ["none", "holm", "bh"]
+
+
+def pairwise_differences(values: np.ndarray):
+    # Mean and sample standard deviation over folds of the difference of every pair of columns (row minus column),
+    # skipping the folds where either algorithm is missing, like the pandas operations on each pair
+    diff = values[:, :, None] - values[:, None, :]
+    n = np.sum(~np.isnan(diff), axis=0)
+    mean_diff = np.nansum(diff, axis=0) / n
+    with np.errstate(invalid="ignore", divide="ignore"):
+        std_diff = np.sqrt(np.nansum((diff - mean_diff) ** 2, axis=0) / (n - 1))
+    return mean_diff, std_diff
+
+
+def bootstrap_p_values(values: np.ndarray, n_resamples: int, seed: int, max_elements: int = 10**7):
+    # Two-sided paired bootstrap p-values of every pair: a resample draws folds with replacement for all algorithms at once,
+    # so it keeps the folds of every algorithm paired and the mean difference of a pair is the difference of their means.
+    # A resample is stored as how many times it draws each fold, so its means are a (resamples, folds) @ (folds, k) product.
+    # Resamples are compared in chunks of at most max_elements pairwise differences.
+    # Pairs with an algorithm that has no value in any fold get a p-value of 1.
+    n_folds, k = values.shape
+    rng = np.random.default_rng(seed)
+    observed = np.isfinite(values)
+    filled = np.where(observed, values, 0.0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        observed_mean = filled.sum(axis=0) / observed.sum(axis=0)
+    observed_diff = observed_mean[:, None] - observed_mean[None, :]
+    # Each pair is compared once, the p-value of (b, a) is the same as of (a, b)
+    rows, cols = np.triu_indices(k, k=1)
+    threshold = np.abs(observed_diff[rows, cols])
+    extreme = np.zeros(rows.size, dtype=np.int64)
+    chunk = max(1, max_elements // max(rows.size, n_folds))
+    for start in range(0, n_resamples, chunk):
+        n = min(chunk, n_resamples - start)
+        idx = rng.integers(0, n_folds, size=(n, n_folds))
+        # Times each resample draws each fold, one bincount over the resamples offset by n_folds
+        counts = np.bincount((idx + n_folds * np.arange(n)[:, None]).ravel(), minlength=n * n_folds)
+        counts = counts.reshape(n, n_folds).astype(np.float64)
+        # Means over the drawn folds where each algorithm has a value, like nanmean over the resampled folds
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = (counts @ filled) / (counts @ observed)
+        # Bootstrap distribution centered on the observed difference, as the distribution under no difference
+        centered = means[:, rows] - means[:, cols]
+        centered -= observed_diff[rows, cols]
+        extreme += np.sum(np.abs(centered, out=centered) >= threshold, axis=0)
+
+    p_values = np.ones((k, k))
+    p_values[rows, cols] = (extreme + 1) / (n_resamples + 1)
+    p_values[cols, rows] = p_values[rows, cols]
+    p_values[np.isnan(observed_diff)] = 1.0
+    return p_values
+
+
+def adjust_p_values(p_values: np.ndarray, correction: str):
+    # Holm (family-wise error rate) or Benjamini-Hochberg (false discovery rate) adjusted p-values
+    m = p_values.size
+    order = np.argsort(p_values, kind="stable")
+    sorted_p = p_values[order]
+    if correction == "holm":
+        adjusted = np.maximum.accumulate(np.minimum(1, (m - np.arange(m)) * sorted_p))
+    elif correction == "bh":
+        adjusted = np.minimum.accumulate((m / np.arange(1, m + 1) * sorted_p)[::-1])[::-1]
+        adjusted = np.minimum(1, adjusted)
+    else:
+        return p_values
+    result = np.empty(m)
+    result[order] = adjusted
+    return result
+
+
+def main(file_path: str, output_path: str, metric: str = "mean_absolute_error", alpha: float = 0.05,
+         bootstrap: int = 0, correction: str = "none", seed: int = 1337):
     df = pd.read_csv(file_path)
 
     summary = (
@@ -14,37 +85,41 @@ def main(file_path: str, output_path: str, metric: str = "mean_absolute_error",
     )
 
     algorithms = summary["algorithm"].tolist()
-    pivot = df.pivot(index="fold", columns="algorithm", values=metric).sort_index()
+    pivot = df.pivot(index="fold", columns="algorithm", values=metric).sort_index()[algorithms]
+    values = pivot.to_numpy(dtype=np.float64)
 
-    dominance = {algo: set() for algo in algorithms}
     n_folds = pivot.shape[0]
 
-    # t critical value for two-sided CI
-    t_crit = t.ppf(1 - alpha/2, df=n_folds - 1)
+    # All pairs at once, entry [a, b] is A minus B
+    mean_diff, std_diff = pairwise_differences(values)
+    se_diff = std_diff / np.sqrt(n_folds)
 
-    for a, b in combinations(algorithms, 2):
-        diff = pivot[a] - pivot[b]  # A minus B
-        mean_diff = diff.mean()
-        std_diff = diff.std(ddof=1)
-        se_diff = std_diff / np.sqrt(n_folds)
-
-        ci_lower = mean_diff - t_crit * se_diff
+    if bootstrap == 0 and correction == "none":
+        # t critical value for two-sided CI
+        t_crit = t.ppf(1 - alpha/2, df=n_folds - 1)
         ci_upper = mean_diff + t_crit * se_diff
 
-        # If CI entirely below zero, then A better
-        if ci_upper < 0:
-            dominance[a].add(b)
-
-        # If CI entirely above zero, then B better
-        elif ci_lower > 0:
-            dominance[b].add(a)
-
-        # else: inconclusive, then no edge
-
-    wins = {algo: len(dominance[algo]) for algo in algorithms}
-
-    summary["wins"] = summary["algorithm"].map(wins)
-    summary["beats"] = summary["algorithm"].map(lambda a: ",".join(sorted(dominance[a])))
+        # If CI entirely below zero, then A better, B better is the transposed entry, else inconclusive
+        better = ci_upper < 0
+    else:
+        if bootstrap > 0:
+            p_values = bootstrap_p_values(values, bootstrap, seed)
+        else:
+            # Paired t-test, the test the CI above is the inversion of
+            with np.errstate(invalid="ignore", divide="ignore"):
+                p_values = 2 * t.sf(np.abs(mean_diff / se_diff), df=n_folds - 1)
+            p_values = np.nan_to_num(p_values, nan=1.0)
+
+        # Each pair is tested once, the correction is over the k(k-1)/2 pairs
+        rows, cols = np.triu_indices(len(algorithms), k=1)
+        significant = np.zeros((len(algorithms), len(algorithms)), dtype=bool)
+        significant[rows, cols] = adjust_p_values(p_values[rows, cols], correction) < alpha
+        significant |= significant.T
+        better = significant & (mean_diff < 0)
+
+    names = np.asarray(algorithms, dtype=object)
+    summary["wins"] = better.sum(axis=1)
+    summary["beats"] = [",".join(sorted(names[row])) for row in better]
 
     summary = summary.sort_values(["wins", "mean"], ascending=[False, True]).reset_index(drop=True)
     summary["rank"] = summary["wins"].rank(method="dense", ascending=False).astype(int)
@@ -59,6 +134,10 @@ if __name__ == "__main__":
     parser.add_argument("-o", "--output", required=True)
     parser.add_argument("--metric", default="mean_absolute_error")
     parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--bootstrap", type=int, default=0, help="Paired bootstrap resamples, instead of the t confidence interval")
+    parser.add_argument("--correction", default="none", choices=CORRECTIONS, help="Multiple comparison correction of the pairwise tests")
+    parser.add_argument("--seed", type=int, default=1337)
 
     args = parser.parse_args()
-    main(args.input, args.output, metric=args.metric, alpha=args.alpha)
\ No newline at end of file
+    main(args.input, args.output, metric=args.metric, alpha=args.alpha,
+         bootstrap=args.bootstrap, correction=args.correction, seed=args.seed)
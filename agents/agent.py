@@ -1,6 +1,9 @@
 from abc import ABC, abstractmethod
 import numpy as np 
 
+# delta_distance of a side that received no orders, larger than any real distance 
+EMPTY_DISTANCE = np.iinfo(np.int64).max
+
 class Agent(ABC): 
     def __init__(self):
         pass
@@ -12,7 +15,7 @@ class Agent(ABC):
 
 class RandomAgent(Agent):
     def __init__(self, p_lambda: float, ng_r: int, ng_p: float, b_p: float, max_delta: int,
-                 seed:int= 1337):
+                 seed:int= 1337, rng: np.random.Generator = None):
         super().__init__()
         self.p_lambda = p_lambda
         self.ng_r = ng_r
@@ -20,20 +23,119 @@ class RandomAgent(Agent):
         self.b_p = b_p
         self.max_delta = max_delta
         self.seed = seed 
-        np.random.seed(seed=self.seed)
+        if rng is None:
+            # Legacy global state, seeded once per agent 
+            np.random.seed(seed=self.seed)
+            self.rng = np.random
+        else:
+            self.rng = rng
+
+        # Probability of each delta_distance and of each (side, delta_distance) level, used to draw whole books at once 
+        self.distance_probabilities = self.make_distance_probabilities()
+        self.level_probabilities = np.concatenate(((1 - self.b_p) * self.distance_probabilities,
+                                                   self.b_p * self.distance_probabilities)) # side 0 (bid) first, then side 1 (ask) 
+
+    def __getstate__(self):
+        # The legacy global state is a module and cannot be pickled, it is saved with np.random.get_state instead 
+        state = self.__dict__.copy()
+        if state["rng"] is np.random:
+            state["rng"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.rng is None:
+            self.rng = np.random
+
+    def make_distance_probabilities(self):
+        # P(delta_distance = d) for d in 1..max_delta, the Poisson tail is folded into max_delta 
+        distance_p = np.ones(self.max_delta)
+        if self.max_delta > 1:
+            k = np.arange(1, self.max_delta - 1)
+            pmf = np.exp(-self.p_lambda) * np.cumprod(np.concatenate(([1.0], self.p_lambda / k)))
+            distance_p[:-1] = pmf
+            distance_p[-1] = max(1.0 - pmf.sum(), 0.0)
+        return distance_p
 
     def bid_ask(self):
-        return np.random.binomial(1,self.b_p)
+        return self.rng.binomial(1,self.b_p)
     
     def delta_distance(self):
-        delta = 1 + np.random.poisson(self.p_lambda)  
+        delta = 1 + self.rng.poisson(self.p_lambda)  
         return min(delta, self.max_delta)
     
     def size(self):
-        return np.random.negative_binomial(self.ng_r, self.ng_p)
+        return self.rng.negative_binomial(self.ng_r, self.ng_p)
     
     def post_order(self):
         return(self.bid_ask(), self.delta_distance(), self.size())
+
+    def post_level_orders(self, n_agents: int):
+        # Draws the orders of n_agents aggregated per (side, delta_distance) level. 
+        # The number of agents on each level is multinomial, and the sum of c negative binomial(r, p)
+        # sizes is negative binomial(c*r, p), so the book has the same distribution as n_agents calls of post_order. 
+        counts = self.rng.multinomial(n_agents, self.level_probabilities).reshape(2, self.max_delta)
+        sides, levels = np.nonzero(counts)
+        sizes = self.rng.negative_binomial(self.ng_r * counts[sides, levels], self.ng_p)
+        return sides, levels + 1, sizes
+
+    def post_market_orders(self, n_orders: int):
+        # Draws n_orders market orders aggregated per side, as sides and total sizes of the sides with orders. 
+        # Market orders of a side cross the same queues one after the other, so their sum fills the same volume. 
+        n_asks = self.rng.binomial(n_orders, self.b_p)
+        counts = np.array([n_orders - n_asks, n_asks])
+        sides = np.flatnonzero(counts)
+        return sides, self.rng.negative_binomial(self.ng_r * counts[sides], self.ng_p)
+
+    def post_level_order_block(self, n_agents: int, n_steps: int):
+        # Same draws as post_level_orders for n_steps books at once, as (n_steps, 2, max_delta) arrays of 
+        # the number of orders and the total size on each (side, delta_distance) level 
+        counts = self.rng.multinomial(n_agents, self.level_probabilities, size=n_steps).reshape(n_steps, 2, self.max_delta)
+        sizes = np.zeros(counts.shape, dtype=np.int64)
+        found = counts > 0
+        sizes[found] = self.rng.negative_binomial(self.ng_r * counts[found], self.ng_p)
+        return counts, sizes
+
+    def post_best_levels(self, n_agents: int, n_steps: int):
+        # Draws only the best level of each side for n_steps books of n_agents orders, 
+        # which is all the microprice depends on. Returns the best bid distance and size, then the best ask distance and size. 
+        n_asks = self.rng.binomial(n_agents, self.b_p, size=n_steps)
+        bid_distances, bid_counts = self.draw_best_distances(n_agents - n_asks)
+        ask_distances, ask_counts = self.draw_best_distances(n_asks)
+
+        bid_sizes = self.draw_sizes(bid_counts)
+        ask_sizes = self.draw_sizes(ask_counts)
+        return bid_distances, bid_sizes, ask_distances, ask_sizes
+
+    def draw_sizes(self, n_orders: np.ndarray):
+        # Total size of n_orders orders, 0 for sides without orders 
+        sizes = np.zeros(n_orders.shape, dtype=np.int64)
+        found = n_orders > 0
+        sizes[found] = self.rng.negative_binomial(self.ng_r * n_orders[found], self.ng_p)
+        return sizes
+
+    def draw_best_distances(self, n_orders: np.ndarray):
+        # The closest non-empty delta_distance and its number of orders, for books with n_orders orders on one side. 
+        # Sides without orders get EMPTY_DISTANCE and 0 orders. 
+        # Uses the multinomial as a chain of binomials: given that all closer distances are empty, 
+        # the number of orders at d is binomial(n_orders, P(d) / P(delta_distance >= d)). 
+        tail_p = np.cumsum(self.distance_probabilities[::-1])[::-1]
+        conditional_p = np.divide(self.distance_probabilities, tail_p, out=np.ones_like(tail_p), where=tail_p > 0)
+        conditional_p[-1] = 1.0
+
+        best_distances = np.full(n_orders.shape, EMPTY_DISTANCE, dtype=np.int64)
+        best_counts = np.zeros(n_orders.shape, dtype=np.int64)
+        unresolved = np.flatnonzero(n_orders)
+        for delta_distance, p in enumerate(conditional_p, start=1):
+            if unresolved.size == 0:
+                break
+            counts = self.rng.binomial(n_orders[unresolved], min(p, 1.0))
+            found = counts > 0
+            best_distances[unresolved[found]] = delta_distance
+            best_counts[unresolved[found]] = counts[found]
+
+            unresolved = unresolved[~found]
+        return best_distances, best_counts
         
         
     
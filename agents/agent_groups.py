@@ -1,7 +1,10 @@
 from abc import ABC, abstractmethod
+import numpy as np
 
-from .agent import RandomAgent
+from .agent import RandomAgent, EMPTY_DISTANCE
 from orderbook.bounded_order_book import BoundedOrderBook
+from orderbook.limit_order_book import LimitOrderBook
+from simulation.kernels import book_microprices
 
 
 class AgentGroup(ABC): 
@@ -11,34 +14,169 @@ class AgentGroup(ABC):
     @abstractmethod
     def post_price(self):
         raise NotImplementedError('Implement price function')
+
+
+def merge_best_levels(best_levels: list):
+    # Merges the best levels drawn by several agents for the same steps: the best distance of a side is the closest 
+    # one over agents, and its size is the sum of the sizes of the agents quoting at that distance. 
+    merged = []
+    for side_distances, side_sizes in ((0, 1), (2, 3)):
+        distances = np.stack([levels[side_distances] for levels in best_levels])
+        sizes = np.stack([levels[side_sizes] for levels in best_levels])
+
+        best_distances = distances.min(axis=0)
+        if np.any(best_distances == EMPTY_DISTANCE):
+            raise ValueError("A side of the order book received no orders.")
+        merged += [best_distances, np.where(distances == best_distances, sizes, 0).sum(axis=0)]
+    return merged
     
 
 class RandomAgentGroup(AgentGroup):
     def __init__(self, order_book: BoundedOrderBook, n_agents: int, p_lambda: float, ng_r: int, ng_p: float, b_p: float, max_delta: int,
-                 seed:int= 1337):
+                 seed:int= 1337, batched: bool = False, rng: np.random.Generator = None):
         super().__init__()
         self.n_agents = n_agents
-        self.agent = RandomAgent(p_lambda, ng_r, ng_p, b_p, max_delta, seed)
+        self.agent = RandomAgent(p_lambda, ng_r, ng_p, b_p, max_delta, seed, rng)
         self.order_book = order_book
+        self.batched = batched
         
 
     
     def post_price(self):
         self.order_book.clear()
         
-        # call order book that iterates N agents 
-        for n in range(self.n_agents):
-            side, delta_distance, size = self.agent.post_order()
-            self.order_book.update(side, delta_distance, size)
+        if self.batched:
+            # draw every agent's order at once, already aggregated per price level 
+            sides, delta_distances, sizes = self.agent.post_level_orders(self.n_agents)
+            self.order_book.update_batch(sides, delta_distances, sizes)
+        else:
+            # call order book that iterates N agents 
+            for n in range(self.n_agents):
+                side, delta_distance, size = self.agent.post_order()
+                self.order_book.update(side, delta_distance, size)
         
         price = self.order_book.microprice()
         self.order_book.set_currentprice(price)
         
         return price
-    
-        
-    
 
+    def post_prices(self, n_steps: int):
+        # Simulates a block of n_steps at once, since each step's price change does not depend on the current price 
+        best_levels = merge_best_levels([self.agent.post_best_levels(self.n_agents, n_steps)])
+        prices = self.order_book.microprice_path(*best_levels)
+        self.order_book.set_currentprice(prices[-1])
 
+        return prices
 
-    
+    def post_book_prices(self, n_steps: int, backend: str = "NumPy"):
+        # Steps the full book n_steps times from one block of draws, with the NumPy or the compiled Numba backend 
+        counts, sizes = self.agent.post_level_order_block(self.n_agents, n_steps)
+        return book_microprices(counts, sizes, self.order_book, backend)
+
+
+class HeterogeneousAgentGroup(AgentGroup):
+    def __init__(self, order_book: BoundedOrderBook, agents: list, seed:int= 1337, batched: bool = True,
+                 rng: np.random.Generator = None):
+        # agents is a list of agent classes, each with its own n_agents, p_lambda, ng_r, ng_p, b_p and max_delta 
+        super().__init__()
+        self.order_book = order_book
+        self.batched = batched
+
+        # Every class draws from its own Generator, spawned from rng or from seed 
+        rng = np.random.default_rng(seed) if rng is None else rng
+        self.n_agents = []
+        self.agents = []
+        for agent_cfg, agent_rng in zip(agents, rng.spawn(len(agents))):
+            agent_cfg = dict(agent_cfg)
+            agent_cfg.pop("name", None)
+            self.n_agents.append(agent_cfg.pop("n_agents"))
+            self.agents.append(RandomAgent(**agent_cfg, seed=seed, rng=agent_rng))
+
+    def post_price(self):
+        self.order_book.clear()
+
+        if self.batched:
+            # one batch of orders per agent class, aggregated per price level 
+            orders = [agent.post_level_orders(n_agents) for agent, n_agents in zip(self.agents, self.n_agents)]
+            sides, delta_distances, sizes = (np.concatenate(columns) for columns in zip(*orders))
+            self.order_book.update_batch(sides, delta_distances, sizes)
+        else:
+            for agent, n_agents in zip(self.agents, self.n_agents):
+                for n in range(n_agents):
+                    side, delta_distance, size = agent.post_order()
+                    self.order_book.update(side, delta_distance, size)
+
+        price = self.order_book.microprice()
+        self.order_book.set_currentprice(price)
+
+        return price
+
+    def post_prices(self, n_steps: int):
+        best_levels = merge_best_levels([agent.post_best_levels(n_agents, n_steps)
+                                         for agent, n_agents in zip(self.agents, self.n_agents)])
+        prices = self.order_book.microprice_path(*best_levels)
+        self.order_book.set_currentprice(prices[-1])
+
+        return prices
+
+    def post_book_prices(self, n_steps: int, backend: str = "NumPy"):
+        # Levels of every class are padded to the deepest class and summed into one book 
+        max_delta = max(agent.max_delta for agent in self.agents)
+        counts = np.zeros((n_steps, 2, max_delta), dtype=np.int64)
+        sizes = np.zeros((n_steps, 2, max_delta), dtype=np.int64)
+        for agent, n_agents in zip(self.agents, self.n_agents):
+            agent_counts, agent_sizes = agent.post_level_order_block(n_agents, n_steps)
+            counts[:, :, :agent.max_delta] += agent_counts
+            sizes[:, :, :agent.max_delta] += agent_sizes
+        return book_microprices(counts, sizes, self.order_book, backend)
+
+
+class LimitOrderAgentGroup(RandomAgentGroup):
+    # Random agents trading on a LimitOrderBook: orders persist across steps, so the book is not cleared, 
+    # each resting order is cancelled with probability cancel_p every step, and each agent sends a market order 
+    # with probability market_p instead of a limit order. Limit orders are placed around the microprice, so only 
+    # market orders cross the spread and trade. Cancels and market orders consume the depth at the best levels, 
+    # and once a best level is gone the microprice, and the levels new orders are placed at, move with it. 
+    def __init__(self, order_book: LimitOrderBook, n_agents: int, p_lambda: float, ng_r: int, ng_p: float, b_p: float, max_delta: int,
+                 seed:int= 1337, batched: bool = True, cancel_p: float = 0.0, market_p: float = 0.0, rng: np.random.Generator = None):
+        super().__init__(order_book, n_agents, p_lambda, ng_r, ng_p, b_p, max_delta, seed, batched, rng)
+        self.cancel_p = cancel_p
+        self.market_p = market_p
+        # Ids of the orders that may still be resting, tracked for the cancels 
+        self.resting = np.zeros(0, dtype=np.int64)
+
+    def post_price(self):
+        self.order_book.step()
+
+        if self.cancel_p > 0 and len(self.resting) > 0:
+            # Every order placed so far is cancelled with probability cancel_p each step. Orders that were filled or expired 
+            # are cancelled as a no-op, which also drops them from the orders tracked. 
+            cancelled = self.agent.rng.random(len(self.resting)) < self.cancel_p
+            self.order_book.cancel_batch(self.resting[cancelled].tolist())
+            self.resting = self.resting[~cancelled]
+
+        n_market = self.agent.rng.binomial(self.n_agents, self.market_p) if self.market_p > 0 else 0
+        n_limit = self.n_agents - n_market
+        if self.batched:
+            sides, delta_distances, sizes = self.agent.post_level_orders(n_limit)
+        else:
+            sides, delta_distances, sizes = (np.array(column) for column in zip(*[self.agent.post_order() for n in range(n_limit)]))
+        resting = self.order_book.update_batch(sides, delta_distances, sizes)
+        if self.cancel_p > 0:
+            self.resting = np.concatenate((self.resting, np.asarray(resting, dtype=np.int64)))
+
+        if n_market > 0:
+            self.order_book.market_batch(*self.agent.post_market_orders(n_market))
+
+        price = self.order_book.microprice()
+        self.order_book.set_currentprice(price)
+
+        return price
+
+    def post_prices(self, n_steps: int):
+        # The book carries state from step to step, so steps cannot be collapsed into a cumulative sum 
+        return np.array([self.post_price() for _ in range(n_steps)])
+
+    def post_book_prices(self, n_steps: int, backend: str = "NumPy"):
+        # Rejected by create_simulation, kept for agent groups built directly 
+        raise NotImplementedError("The limit order book is compiled with ORDER_BOOK.backend: Numba, use the Step engine without SIMULATOR.backend.")
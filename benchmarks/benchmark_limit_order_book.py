@@ -0,0 +1,69 @@
+import argparse
+import time
+import numpy as np
+
+from orderbook.limit_order_book import LimitOrderBook
+from orderbook.array_limit_order_book import ArrayLimitOrderBook, SUBMIT, CANCEL, STEP
+
+
+def main(n_events: int, seed: int = 1337, backend: str = "Python"):
+    # Replays a random stream of order events on one core: submits around the mid (part of them marketable), 
+    # cancellations of earlier orders, and one clock step (with expiries) every 1000 events. 
+    # The Python backend calls LimitOrderBook once per event, the Numba backend replays the whole stream through 
+    # ArrayLimitOrderBook in one compiled call. 
+    rng = np.random.default_rng(seed)
+    sides = rng.integers(0, 2, size=n_events).tolist()
+    offsets = rng.poisson(2.0, size=n_events) - 1
+    levels = np.where(np.array(sides) == 0, 200 - offsets, 200 + offsets).tolist()
+    sizes = rng.negative_binomial(10, 0.17, size=n_events).tolist()
+    is_cancel = (rng.random(n_events) < 0.2).tolist()
+    cancel_ids = (rng.random(n_events) * np.arange(n_events)).astype(np.int64).tolist()
+
+    if backend == "Numba":
+        # Same events, with the steps as events of their own after every 1000th event 
+        kinds = np.where(is_cancel, CANCEL, SUBMIT)
+        n_steps = -(-n_events // 1000)
+        at = np.arange(n_steps) * 1000 + 1
+        columns = [np.insert(np.asarray(column), at, value) for column, value in
+                   ((kinds, STEP), (sides, 0), (levels, 0), (sizes, 0), (cancel_ids, 0))]
+
+        # Compiles run_events before timing 
+        ArrayLimitOrderBook(tick_size=0.5, starting_price=100.0, ttl=60).run(*(column[:1000] for column in columns))
+
+        order_book = ArrayLimitOrderBook(tick_size=0.5, starting_price=100.0, ttl=60)
+        start = time.perf_counter()
+        order_book.run(*columns)
+        elapsed = time.perf_counter() - start
+        print("{0:,} events in {1:.3f}s: {2:,.0f} events/sec, traded volume {3:,}".format(
+            n_events, elapsed, n_events / elapsed, order_book.traded_volume))
+        return
+
+    order_book = LimitOrderBook(tick_size=0.5, starting_price=100.0, ttl=60)
+    submit = order_book.submit
+    cancel = order_book.cancel
+    step = order_book.step
+
+    start = time.perf_counter()
+    for i in range(n_events):
+        if is_cancel[i]:
+            cancel(cancel_ids[i])
+        else:
+            submit(sides[i], levels[i], sizes[i])
+        if i % 1000 == 0:
+            step()
+    elapsed = time.perf_counter() - start
+
+    print("{0:,} events in {1:.3f}s: {2:,.0f} events/sec, traded volume {3:,}".format(
+        n_events, elapsed, n_events / elapsed, order_book.traded_volume))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+         prog = "benchmark_limit_order_book.py",
+         description = "Measures LimitOrderBook throughput in order events per second."
+    )
+    parser.add_argument("-n", "--n_events", type=int, default=2_000_000)
+    parser.add_argument("-b", "--backend", default="Python", choices=["Python", "Numba"])
+
+    args = vars(parser.parse_args())
+    main(args["n_events"], backend=args["backend"])
@@ -0,0 +1,82 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+FEATURE_STORE_SUFFIX = ".store"
+
+
+def is_feature_store(path: str):
+    return path.rstrip("/").endswith(FEATURE_STORE_SUFFIX)
+
+
+def column_path(store_dir: str, column: str):
+    return os.path.join(store_dir, column + ".bin")
+
+
+class FeatureStoreWriter():
+    # Streams feature frames to a columnar store: a directory with one raw binary file per column and a meta.json 
+    # with the number of rows and the dtype of each column. With dtype set, floating point columns are stored as dtype. 
+    def __init__(self, store_dir: str, dtype: str = None):
+        self.store_dir = store_dir
+        self.dtype = dtype
+        self.n_rows = 0
+        self.columns = None
+        self.files = {}
+        os.makedirs(store_dir, exist_ok=True)
+        # Marks a store being rewritten as incomplete until close 
+        if os.path.exists(os.path.join(store_dir, "meta.json")):
+            os.remove(os.path.join(store_dir, "meta.json"))
+
+    def write(self, data: pd.DataFrame):
+        if self.columns is None:
+            self.columns = {}
+            for column in data.columns:
+                dtype = data[column].dtype
+                if self.dtype is not None and np.issubdtype(dtype, np.floating):
+                    dtype = np.dtype(self.dtype)
+                self.columns[column] = np.dtype(dtype).str
+                self.files[column] = open(column_path(self.store_dir, column), "wb")
+
+        for column, dtype in self.columns.items():
+            np.ascontiguousarray(data[column].to_numpy(), dtype=dtype).tofile(self.files[column])
+        self.n_rows += len(data)
+
+    def close(self):
+        for file in self.files.values():
+            file.close()
+        # Written last, so a store without meta.json is incomplete 
+        with open(os.path.join(self.store_dir, "meta.json"), "w") as file:
+            json.dump({"n_rows": self.n_rows, "columns": self.columns or {}}, file, indent=4)
+
+
+def write_feature_store(data: pd.DataFrame, store_dir: str, dtype: str = None):
+    writer = FeatureStoreWriter(store_dir, dtype)
+    writer.write(data)
+    writer.close()
+
+
+def read_feature_store_metadata(store_dir: str):
+    with open(os.path.join(store_dir, "meta.json"), "r") as file:
+        return json.load(file)
+
+
+def read_feature_store(store_dir: str, columns: list = None, dtype: str = None):
+    # Memory-maps only the given columns. Columns already stored as dtype (or all columns without dtype) are zero-copy 
+    # read-only views of their files, floating point columns stored with another precision are cast to dtype. 
+    metadata = read_feature_store_metadata(store_dir)
+    columns = list(metadata["columns"]) if columns is None else columns
+
+    arrays = {}
+    for column in columns:
+        if column not in metadata["columns"]:
+            raise KeyError(f"Column {column} is not in the feature store {store_dir}.")
+        stored_dtype = np.dtype(metadata["columns"][column])
+        if metadata["n_rows"] == 0:
+            array = np.empty(0, dtype=stored_dtype)
+        else:
+            array = np.memmap(column_path(store_dir, column), dtype=stored_dtype, mode="r", shape=(metadata["n_rows"],))
+        if dtype is not None and np.issubdtype(stored_dtype, np.floating) and stored_dtype != np.dtype(dtype):
+            array = array.astype(dtype)
+        arrays[column] = array
+    return pd.DataFrame(arrays, copy=False)
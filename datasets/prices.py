@@ -0,0 +1,92 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+
+def metadata_path(path: str):
+    return path + ".json"
+
+
+class PriceWriter():
+    # Streams price blocks to a .npy file (with a .json metadata sidecar) or to a CSV file, 
+    # so memory only depends on the block size. Passing the state of a previous writer continues its output. 
+    def __init__(self, output_path: str, n_steps: int, metadata: dict = None, resume: dict = None):
+        self.output_path = output_path
+        self.binary = output_path.endswith(".npy")
+
+        if resume is not None:
+            if self.binary:
+                self.prices = np.load(output_path, mmap_mode="r+")
+            else:
+                # Drops anything written after the state was taken 
+                self.file = open(output_path, "r+", newline="")
+                self.file.truncate(resume["offset"])
+                self.file.seek(resume["offset"])
+        elif self.binary:
+            self.prices = np.lib.format.open_memmap(output_path, mode="w+", dtype=np.float64, shape=(n_steps,))
+            with open(metadata_path(output_path), "w") as file:
+                json.dump({"n_steps": n_steps, "columns": ["t", "price"], **(metadata or {})}, file, indent=4)
+        else:
+            self.file = open(output_path, "w", newline="")
+            self.file.write("t,price\n")
+
+    def write(self, start: int, prices: np.ndarray):
+        if self.binary:
+            self.prices[start:start + prices.size] = prices
+        else:
+            block = pd.DataFrame({'t': np.arange(start, start + prices.size), 'price': prices})
+            block.to_csv(self.file, header=False, index=False)
+
+    def flush(self):
+        # Makes what was written so far durable, and returns the state needed to resume from it 
+        if self.binary:
+            self.prices.flush()
+            return {}
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return {"offset": self.file.tell()}
+
+    def close(self):
+        if self.binary:
+            self.prices.flush()
+            del self.prices
+        else:
+            self.file.close()
+
+
+def read_metadata(path: str):
+    with open(metadata_path(path), "r") as file:
+        return json.load(file)
+
+
+def read_prices(path: str, path_idx: int = 0):
+    # Reads a t, price frame from a CSV file or from a simulated .npy file (a single path or an ensemble) 
+    if not path.endswith(".npy"):
+        return pd.read_csv(path)
+
+    prices = np.load(path, mmap_mode="r")
+    if prices.ndim == 2:
+        prices = prices[path_idx]
+    return pd.DataFrame({'t': np.arange(prices.size), 'price': np.asarray(prices)})
+
+
+def iter_prices(path: str, chunksize: int, path_idx: int = 0):
+    # Same frame as read_prices, in consecutive chunks of at most chunksize rows 
+    if not path.endswith(".npy"):
+        yield from pd.read_csv(path, chunksize=chunksize)
+        return
+
+    prices = np.load(path, mmap_mode="r")
+    if prices.ndim == 2:
+        prices = prices[path_idx]
+    for start in range(0, prices.size, chunksize):
+        chunk = np.asarray(prices[start:start + chunksize])
+        yield pd.DataFrame({'t': np.arange(start, start + chunk.size), 'price': chunk})
+
+
+def read_price_array(path: str):
+    # Prices only, memory-mapped for .npy files: (n_steps,) for a single path or (n_paths, n_steps) for an ensemble 
+    if path.endswith(".npy"):
+        return np.load(path, mmap_mode="r")
+    return pd.read_csv(path)['price'].to_numpy()
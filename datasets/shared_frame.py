@@ -0,0 +1,50 @@
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+
+
+def share_array(array: np.ndarray):
+    # Copies an array into a shared memory block. Returns the block, which the caller closes and unlinks when done, 
+    # and a small picklable spec that other processes attach to with attach_array. 
+    # Keeps a Fortran ordered array in Fortran order, so computations on the view sum in the same order as on the array 
+    order = "F" if array.flags.f_contiguous and not array.flags.c_contiguous else "C"
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf, order=order)[...] = array
+    return block, {"name": block.name, "shape": array.shape, "dtype": array.dtype.str, "order": order}
+
+
+def attach_array(spec: dict):
+    # Read-only zero-copy view on the shared memory block of share_array, the block must stay open while it is used 
+    block = shared_memory.SharedMemory(name=spec["name"])
+    array = np.ndarray(spec["shape"], dtype=np.dtype(spec["dtype"]), buffer=block.buf, order=spec["order"])
+    array.setflags(write=False)
+    return array, block
+
+
+def share_frame(data: pd.DataFrame):
+    # Copies each column of a frame into its own shared memory block. Returns the blocks, which the caller closes and 
+    # unlinks when done, and a small picklable spec that other processes attach to with attach_frame. 
+    blocks = []
+    columns = []
+    for column in data.columns:
+        block, spec = share_array(data[column].to_numpy())
+        blocks.append(block)
+        columns.append((column, spec))
+    return blocks, {"n_rows": len(data), "columns": columns}
+
+
+def attach_frame(spec: dict):
+    # Frame of zero-copy views on the shared memory blocks of share_frame, the blocks must stay open while it is used 
+    blocks = []
+    arrays = {}
+    for column, array_spec in spec["columns"]:
+        arrays[column], block = attach_array(array_spec)
+        blocks.append(block)
+    return pd.DataFrame(arrays, copy=False), blocks
+
+
+def release_blocks(blocks: list, unlink: bool = False):
+    for block in blocks:
+        block.close()
+        if unlink:
+            block.unlink()
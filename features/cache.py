@@ -0,0 +1,170 @@
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import time
+import pandas as pd
+
+DEFAULT_CACHE_DIR = ".cache/features"
+DEFAULT_MAX_BYTES = 10 * 1024 ** 3
+
+# Bump when a change to the feature code changes its output, so entries of the previous code are never hit 
+FEATURES_VERSION = 1
+
+
+def hash_file(path: str, block_size: int = 1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_frame(data: pd.DataFrame):
+    # Hash of the index, the columns and the values of a frame 
+    digest = hashlib.sha256()
+    digest.update(json.dumps([str(column) for column in data.columns]).encode())
+    digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class FeatureCache():
+    # Content-addressed cache of feature frames: an entry is stored under the hash of its input contents, its parameters 
+    # and FEATURES_VERSION, so any change upstream is a miss. Entries are pickled frames with a .json sidecar, 
+    # and the least recently used ones are evicted once the cache is larger than max_bytes. 
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def file_hash(self, path: str):
+        # Content hash of a file, remembered by path, size and modification time so a large input is only read once 
+        index_path = os.path.join(self.cache_dir, "file_hashes.json")
+        index = {}
+        if os.path.exists(index_path):
+            with open(index_path, "r") as file:
+                index = json.load(file)
+
+        stat = os.stat(path)
+        path_key = os.path.abspath(path)
+        entry = index.get(path_key)
+        if entry is not None and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["sha256"]
+
+        sha256 = hash_file(path)
+        index[path_key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256}
+        self.write_atomic(index_path, json.dumps(index, indent=4).encode())
+        return sha256
+
+    @staticmethod
+    def key(content_hash: str, **params):
+        # Cache key of an input (by content hash) and the parameters it is turned into features with 
+        params = {"content": content_hash, "version": FEATURES_VERSION, **params}
+        return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+    def entry_path(self, key: str):
+        return os.path.join(self.cache_dir, key + ".pkl")
+
+    def load(self, key: str):
+        # The cached frame, or None on a miss 
+        path = self.entry_path(key)
+        try:
+            with open(path, "rb") as file:
+                data = pickle.load(file)
+        except FileNotFoundError:
+            return None
+        # Marks the entry as recently used 
+        os.utime(path)
+        return data
+
+    def store(self, key: str, data: pd.DataFrame, **params):
+        self.write_atomic(self.entry_path(key), pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+        metadata = {"key": key, "version": FEATURES_VERSION, "created": time.time(), "rows": len(data), **params}
+        self.write_atomic(os.path.join(self.cache_dir, key + ".json"), json.dumps(metadata, indent=4).encode())
+        self.evict()
+
+    @staticmethod
+    def write_atomic(path: str, content: bytes):
+        # Written to a uniquely named file next to the target then renamed, so a crash never leaves a partial entry 
+        # and concurrent runs writing the same entry never write into each other's file 
+        file = tempfile.NamedTemporaryFile(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp", delete=False)
+        try:
+            with file:
+                file.write(content)
+            os.replace(file.name, path)
+        except BaseException:
+            os.remove(file.name)
+            raise
+
+    def entries(self):
+        # Entries from the least to the most recently used 
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".pkl"):
+                continue
+            key = name[:-len(".pkl")]
+            stat = os.stat(self.entry_path(key))
+            metadata = {}
+            metadata_path = os.path.join(self.cache_dir, key + ".json")
+            if os.path.exists(metadata_path):
+                with open(metadata_path, "r") as file:
+                    metadata = json.load(file)
+            entries.append({**metadata, "key": key, "bytes": stat.st_size, "last_used": stat.st_mtime})
+        return sorted(entries, key=lambda entry: entry["last_used"])
+
+    def remove(self, key: str):
+        for path in (self.entry_path(key), os.path.join(self.cache_dir, key + ".json")):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def evict(self, max_bytes: int = None):
+        # Removes the least recently used entries until the cache fits in max_bytes, returns the removed keys 
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(entry["bytes"] for entry in entries)
+        removed = []
+        for entry in entries:
+            if total <= max_bytes:
+                break
+            self.remove(entry["key"])
+            total -= entry["bytes"]
+            removed.append(entry["key"])
+        return removed
+
+    def purge(self):
+        # Removes every entry 
+        return self.evict(max_bytes=0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+         prog = "cache.py",
+         description = "Inspects and purges the feature cache."
+    )
+    parser.add_argument("command", choices=["list", "evict", "purge", "remove"])
+    parser.add_argument("--cache_dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--max_bytes", type=int, default=DEFAULT_MAX_BYTES)
+    parser.add_argument("--key", default=None, help="Entry to remove")
+
+    args = vars(parser.parse_args())
+    cache = FeatureCache(args["cache_dir"], args["max_bytes"])
+
+    if args["command"] == "list":
+        entries = cache.entries()
+        for entry in entries:
+            last_used = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["last_used"]))
+            params = {name: value for name, value in entry.items() if name not in ("key", "bytes", "last_used", "created")}
+            print(f"{entry['key'][:16]}  {entry['bytes'] / 1024 ** 2:10.1f} MB  {last_used}  {params}")
+        print(f"{len(entries)} entries, {sum(entry['bytes'] for entry in entries) / 1024 ** 2:.1f} MB")
+    elif args["command"] == "remove":
+        if args["key"] is None:
+            parser.error("remove needs --key")
+        matches = [entry["key"] for entry in cache.entries() if entry["key"].startswith(args["key"])]
+        for key in matches:
+            cache.remove(key)
+        print(f"Removed {len(matches)} entries")
+    else:
+        removed = cache.evict() if args["command"] == "evict" else cache.purge()
+        print(f"Removed {len(removed)} entries")
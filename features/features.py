@@ -2,6 +2,8 @@ from abc import ABC, abstractmethod
 import pandas as pd 
 import numpy as np
 
+from features.cache import FeatureCache, hash_frame
+
 class Features(ABC):
     def __init__(self):
         pass
@@ -12,8 +14,9 @@ class Features(ABC):
     
 
 class VolatilityFeatures(Features):
-    def __init__(self):
-        pass 
+    def __init__(self, cache: FeatureCache = None):
+        # Optional FeatureCache checked by make_features before computing 
+        self.cache = cache
 
     def make_target(self, data: pd.DataFrame, horizon: int = 3_600):      
         if 'log_returns' not in data.columns: 
@@ -51,14 +54,214 @@ class VolatilityFeatures(Features):
             data[f'log_return_lag_{i}_hour'] = data['log_returns'].shift(horizon*i)
         return data.dropna()
 
-    def make_features(self, data: pd.DataFrame, lag: int = 4, horizon: int = 3_600):
-        data = data.copy()
+    @staticmethod
+    def rolling_volatility(cumulative_sq: np.ndarray, start: int, stop: int, window: int):
+        # Square root of the rolling sum of squared log returns over `window` rows, for rows [start, stop) 
+        rolling_sum = cumulative_sq[start:stop] - cumulative_sq[start - window:stop - window]
+        # Rolling sums are non-negative, the prefix sum difference can be off by rounding 
+        return np.sqrt(np.maximum(rolling_sum, 0).astype(np.float64))
+
+    @classmethod
+    def feature_matrix(cls, price: np.ndarray, log_returns: np.ndarray, cumulative_sq: np.ndarray, start: int, stop: int,
+                       lag: int = 4, horizon: int = 3_600):
+        # Features of rows [start, stop), which need lag*horizon rows before start and horizon rows after stop 
+        columns = ['log_returns', 'target']
+        columns += [f'price_lag_{i}_hour' for i in range(1, lag+1)]
+        columns += [f'volatility_lag_{i}_hour' for i in range(1, lag+1)]
+        columns += [f'log_return_lag_{i}_hour' for i in range(1, lag+1)]
+        # Column-major, so each column is written contiguously 
+        features = np.empty((stop - start, len(columns)), order='F')
+
+        features[:, 0] = log_returns[start:stop]
+        # Next hour volatility 
+        features[:, 1] = cls.rolling_volatility(cumulative_sq, start + horizon, stop + horizon, horizon)
+        for i in range(1, lag+1):
+            shift = horizon * i
+            features[:, 1 + i] = price[start - shift:stop - shift]
+            features[:, 1 + lag + i] = cls.rolling_volatility(cumulative_sq, start, stop, shift)
+            features[:, 1 + 2 * lag + i] = log_returns[start - shift:stop - shift]
+        return features, columns
+
+    @staticmethod
+    def prefix_sums(data: pd.DataFrame):
+        # Prices, log returns and the prefix sum of squared log returns of a series, shared by every horizon of make_features 
+        price = data['price'].to_numpy(dtype=np.float64)
+        if 'log_returns' in data.columns:
+            log_returns = data['log_returns'].to_numpy(dtype=np.float64)
+        else:
+            log_returns = np.empty(price.size)
+            log_returns[0] = np.nan
+            log_returns[1:] = np.diff(np.log(price))
+
+        # cumulative_sq[i] is the sum of squared log returns up to row i, the rolling sum over (i - w, i] is cumulative_sq[i] - cumulative_sq[i - w]. 
+        # Accumulated in extended precision, so differences of two large sums keep the precision of a rolling sum. 
+        cumulative_sq = np.cumsum(np.nan_to_num(log_returns).astype(np.longdouble) ** 2)
+        return price, log_returns, cumulative_sq
+
+    def make_features(self, data: pd.DataFrame, lag: int = 4, horizon: int = 3_600, prefix_sums: tuple = None):
+        # Single pass version of make_target, make_lagged_prices, make_lagged_volatility and make_lagged_log_returns: 
+        # squared log returns are summed once into a prefix sum, every rolling window is a difference of two of its entries, 
+        # and every lagged column is a shifted slice. prefix_sums can be passed to reuse them across horizons. 
+        key = None
+        if self.cache is not None and prefix_sums is None:
+            key = self.cache.key(hash_frame(data), lag=lag, horizon=horizon)
+            features = self.cache.load(key)
+            if features is not None:
+                return features
+
+        price, log_returns, cumulative_sq = self.prefix_sums(data) if prefix_sums is None else prefix_sums
+
+        # Rows kept by the sequential dropna calls: the first row has no log return, the last horizon rows have no target, 
+        # and each of the 3 lagged feature groups drops another lag*horizon rows from the start 
+        start = max(3 * lag * horizon, 1)
+        stop = price.size - horizon
+        n_rows = max(stop - start, 0)
+        stop = start + n_rows
+
+        features, columns = self.feature_matrix(price, log_returns, cumulative_sq, start, stop, lag, horizon)
+
+        data = data.iloc[start:stop].drop(columns=['log_returns'], errors='ignore')
+        features = pd.DataFrame(features, index=data.index, columns=columns, copy=False)
+        features = pd.concat([data, features], axis=1).dropna()
+        if key is not None:
+            self.cache.store(key, features, lag=lag, horizon=horizon)
+        return features
+
+    def make_horizon_features(self, data: pd.DataFrame, horizons: list, lag: int = 4):
+        # make_features for several horizons of the same series, keyed by a horizon column, from one prefix sum 
+        prefix_sums = self.prefix_sums(data)
+        features = [self.make_features(data, lag, horizon, prefix_sums) for horizon in horizons]
+        return pd.concat(features, keys=horizons, names=['horizon', None]).reset_index(level='horizon')
+
+
+class OnlineVolatilityFeatures(Features):
+    # Online counterpart of VolatilityFeatures: takes one price at a time and returns its feature vector in O(lag), 
+    # keeping the last lag*horizon prices, log returns and prefix sums of squared log returns in ring buffers. 
+    # Features start lag*horizon + 1 rows in, earlier than the rows kept by make_features, and are identical on the rows both produce. 
+    def __init__(self, lag: int = 4, horizon: int = 3_600):
+        self.lag = lag
+        self.horizon = horizon
+        self.feature_names = ['log_returns']
+        self.feature_names += [f'price_lag_{i}_hour' for i in range(1, lag+1)]
+        self.feature_names += [f'volatility_lag_{i}_hour' for i in range(1, lag+1)]
+        self.feature_names += [f'log_return_lag_{i}_hour' for i in range(1, lag+1)]
+        self.reset()
+
+    def reset(self):
+        self.size = self.lag * self.horizon + 1
+        self.prices = np.empty(self.size)
+        self.log_returns = np.empty(self.size)
+        # Same extended precision prefix sum as VolatilityFeatures.make_features, so windows are computed identically 
+        self.cumulative_sq = np.empty(self.size, dtype=np.longdouble)
+        self.n_ticks = 0
+        self.last_log_price = None
+
+    def update(self, price: float):
+        # Returns the features of this price, or None until lag*horizon previous prices have been seen 
+        log_price = np.log(np.float64(price))
+        if self.last_log_price is None:
+            log_return = np.nan
+            cumulative_sq = np.longdouble(0)
+        else:
+            log_return = log_price - self.last_log_price
+            cumulative_sq = self.cumulative_sq[(self.n_ticks - 1) % self.size] + np.longdouble(log_return) ** 2
+        self.last_log_price = log_price
+
+        i = self.n_ticks % self.size
+        self.prices[i] = price
+        self.log_returns[i] = log_return
+        self.cumulative_sq[i] = cumulative_sq
+        self.n_ticks += 1
+
+        # The oldest lag needs the log return of lag*horizon rows ago, which does not exist for the first row 
+        if self.n_ticks <= self.size:
+            return None
+
+        lag = self.lag
+        features = np.empty(1 + 3 * lag)
+        features[0] = log_return
+        for k in range(1, lag+1):
+            j = (i - self.horizon * k) % self.size
+            features[k] = self.prices[j]
+            features[lag + k] = np.sqrt(np.float64(max(cumulative_sq - self.cumulative_sq[j], 0)))
+            features[2 * lag + k] = self.log_returns[j]
+        return features
+
+    def make_features(self, data: pd.DataFrame):
+        # Replays a price series through update, one row per price that has features 
+        self.reset()
+        rows = []
+        index = []
+        for idx, price in zip(data.index, data['price'].to_numpy(dtype=np.float64)):
+            features = self.update(price)
+            if features is not None:
+                rows.append(features)
+                index.append(idx)
+        return pd.DataFrame(rows, index=index, columns=self.feature_names)
+
+
+class ChunkedVolatilityFeatures(Features):
+    # Out-of-core counterpart of VolatilityFeatures.make_features: takes a series in consecutive chunks and returns the 
+    # feature rows each chunk completes, identical to the rows make_features returns for the whole series. 
+    # Only the last lag*horizon rows of history and the rows still waiting for their horizon rows of target are kept between chunks. 
+    def __init__(self, lag: int = 4, horizon: int = 3_600):
+        self.lag = lag
+        self.horizon = horizon
+        self.reset()
+
+    def reset(self):
+        self.data = None
+        self.price = np.empty(0)
+        self.log_returns = np.empty(0)
+        self.cumulative_sq = np.empty(0, dtype=np.longdouble)
+        # Global row of the first buffered row, and the next row to emit 
+        self.offset = 0
+        self.next_row = max(3 * self.lag * self.horizon, 1)
+        self.last_log_price = None
+
+    def update(self, data: pd.DataFrame):
+        # Appends the next rows of the series and returns the feature rows that are now complete 
+        price = data['price'].to_numpy(dtype=np.float64)
+        log_price = np.log(price)
+        # The first row of the series has no log return 
+        log_returns = np.diff(log_price, prepend=np.nan if self.last_log_price is None else self.last_log_price)
+        if price.size:
+            self.last_log_price = log_price[-1]
+
+        # Continues the prefix sum of the previous chunks with the same sequential additions as one cumsum over the whole series 
+        squared = np.nan_to_num(log_returns).astype(np.longdouble) ** 2
+        if self.cumulative_sq.size:
+            cumulative_sq = np.cumsum(np.concatenate((self.cumulative_sq[-1:], squared)))[1:]
+        else:
+            cumulative_sq = np.cumsum(squared)
+
+        self.data = data if self.data is None else pd.concat([self.data, data], ignore_index=True)
+        self.price = np.concatenate((self.price, price))
+        self.log_returns = np.concatenate((self.log_returns, log_returns))
+        self.cumulative_sq = np.concatenate((self.cumulative_sq, cumulative_sq))
+
+        start = self.next_row - self.offset
+        stop = max(self.price.size - self.horizon, start)
+        features, columns = VolatilityFeatures.feature_matrix(self.price, self.log_returns, self.cumulative_sq,
+                                                              start, stop, self.lag, self.horizon)
+        rows = self.data.iloc[start:stop].drop(columns=['log_returns'], errors='ignore')
+        # Indexed by global row, like the rows of make_features 
+        rows.index = pd.RangeIndex(self.next_row, self.next_row + stop - start)
+        features = pd.DataFrame(features, index=rows.index, columns=columns, copy=False)
+        self.next_row += stop - start
 
-        data = self.make_target(data, horizon)
-        data = self.make_lagged_prices(data, lag, horizon)
-        data = self.make_lagged_volatility(data, lag, horizon)
-        data = self.make_lagged_log_returns(data, lag, horizon)
+        # Keeps the history the next rows look back to, and at least the last row to continue the prefix sum 
+        keep = max(min(self.next_row - self.lag * self.horizon - self.offset, self.price.size - 1), 0)
+        self.data = self.data.iloc[keep:].reset_index(drop=True)
+        self.price = self.price[keep:]
+        self.log_returns = self.log_returns[keep:]
+        self.cumulative_sq = self.cumulative_sq[keep:]
+        self.offset += keep
 
-        return data 
+        return pd.concat([rows, features], axis=1).dropna()
 
-        
\ No newline at end of file
+    def make_features(self, chunks):
+        # Yields the feature rows of a series given as an iterable of consecutive chunks 
+        self.reset()
+        for data in chunks:
+            yield self.update(data)
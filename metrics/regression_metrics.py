@@ -1,7 +1,26 @@
+import numpy as np
+
+
+def residuals(y, y_hat):
+    # Flattened float64 targets and residuals of a single output regression 
+    y = np.asarray(y, dtype=np.float64).reshape(-1)
+    y_hat = np.asarray(y_hat, dtype=np.float64).reshape(-1)
+    if y.shape != y_hat.shape:
+        raise ValueError(f"y and y_hat have different numbers of samples: {y.size} and {y_hat.size}.")
+    return y, y - y_hat
+
+
+def r2(residual_sum_squares: float, total_sum_squares: float, n: int):
+    # As sklearn.metrics.r2_score with force_finite: undefined for less than two samples, and a constant y scores 1.0 
+    # if predicted exactly, else 0.0 
+    if n < 2:
+        return float("nan")
+    if total_sum_squares == 0:
+        return 1.0 if residual_sum_squares == 0 else 0.0
+    return float(1 - residual_sum_squares / total_sum_squares)
 
 
 class RegressionMetric():
-    import sklearn.metrics as sk_metrics
     import statistics as stats
     def __init__(self) -> None:
         self.scores = {
@@ -12,23 +31,34 @@ class RegressionMetric():
         }
 
     def update(self, y, y_hat):
-        self.scores["mean_absolute_error"].append(self.sk_metrics.mean_absolute_error(y, y_hat))
-        self.scores["mean_squared_error"].append(self.sk_metrics.mean_squared_error(y, y_hat))
-        self.scores["max_error"].append(self.sk_metrics.max_error(y, y_hat))
-        self.scores["r2"].append(self.sk_metrics.r2_score(y, y_hat))
+        # Scores a fold and returns its scores, so they can be logged without computing them again 
+        scores = self(y, y_hat)
+        for metric, value in scores.items():
+            self.scores[metric].append(value)
+        return scores
+
+    def update_chunks(self, chunks):
+        # Scores a fold given as an iterable of (y, y_hat) chunks, without holding the whole fold in memory 
+        accumulator = RegressionAccumulator()
+        for y, y_hat in chunks:
+            accumulator.update(y, y_hat)
+        scores = accumulator.result()
+        for metric, value in scores.items():
+            self.scores[metric].append(value)
+        return scores
 
     def mean(self):
         mean_metrics = {}
         for metric, values in self.scores.items():
             mean_metrics[metric] = self.stats.mean(values)
         return mean_metrics
-    
+
     def stdev(self):
         std_metrics = {}
         for metric, values in self.scores.items():
             std_metrics[metric] = self.stats.pstdev(values)
         return std_metrics
-    
+
     def reset(self):
         self.scores = {
             "mean_absolute_error": [],
@@ -38,11 +68,59 @@ class RegressionMetric():
         }
 
     def __call__(self, y, y_hat):
+        # All the metrics from one residual array, matching sklearn.metrics to floating point tolerance 
+        y, residual = residuals(y, y_hat)
+        absolute = np.abs(residual)
+        residual_sum_squares = np.dot(residual, residual)
+        centered = y - y.mean()
         scores = {
-            "mean_absolute_error": self.sk_metrics.mean_absolute_error(y, y_hat),
-            "mean_squared_error": self.sk_metrics.mean_squared_error(y, y_hat),
-            "max_error": self.sk_metrics.max_error(y, y_hat), # calculates the maximum residual error 
-            "r2": self.sk_metrics.r2_score(y, y_hat)
+            "mean_absolute_error": float(absolute.mean()),
+            "mean_squared_error": float(residual_sum_squares / y.size),
+            "max_error": float(absolute.max()), # calculates the maximum residual error 
+            "r2": r2(residual_sum_squares, np.dot(centered, centered), y.size)
         }
 
         return scores
+
+
+class RegressionAccumulator():
+    # Streaming version of RegressionMetric.__call__ for test sets scored in chunks: keeps the running sums of the absolute 
+    # and squared residuals, the maximum residual, and the mean and sum of squared deviations of y, merged chunk by chunk 
+    # with Chan et al.'s update of Welford's algorithm. 
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self):
+        self.n = 0
+        self.sum_absolute = 0.0
+        self.sum_squares = 0.0
+        self.max_absolute = 0.0
+        self.y_mean = 0.0
+        self.y_sum_squares = 0.0
+
+    def update(self, y, y_hat):
+        y, residual = residuals(y, y_hat)
+        if y.size == 0:
+            return
+        absolute = np.abs(residual)
+        self.sum_absolute += absolute.sum()
+        self.sum_squares += np.dot(residual, residual)
+        self.max_absolute = max(self.max_absolute, absolute.max())
+
+        chunk_mean = y.mean()
+        centered = y - chunk_mean
+        n = self.n + y.size
+        delta = chunk_mean - self.y_mean
+        self.y_sum_squares += np.dot(centered, centered) + delta ** 2 * self.n * y.size / n
+        self.y_mean += delta * y.size / n
+        self.n = n
+
+    def result(self):
+        if self.n == 0:
+            raise ValueError("No samples were scored.")
+        return {
+            "mean_absolute_error": float(self.sum_absolute / self.n),
+            "mean_squared_error": float(self.sum_squares / self.n),
+            "max_error": float(self.max_absolute),
+            "r2": r2(self.sum_squares, self.y_sum_squares, self.n)
+        }
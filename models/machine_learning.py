@@ -1,6 +1,21 @@
 class MachineLearning():
+    # With warm_start, train starts from start_params, the parameters fitted on the previous fold by name, which reset keeps. 
+    # Only models whose start_params are starting values of the optimizer, which do not change the optimum, support it. 
+    # The target scaler is refit on every fold, so only the parameters that do not depend on the scale of the target are 
+    # carried over, and the others start from the fold's own starting values. 
+    supports_warm_start = False
+    warm_start = False
+    # With one_step, the test window is scored by walk_forward instead of __call__: each test point is forecast horizon steps 
+    # ahead from the targets up to horizon steps before it, with the parameters fitted on the training window frozen. 
+    # A target is known horizon steps after its own row, e.g. the volatility over the next horizon returns, so a forecast 
+    # that also used the targets in between would already have seen the returns it is scored against. 
+    supports_one_step = False
+    one_step = False
+    horizon = 1
+
     def __init__(self, hyperparameters:dict):
         self.hyperparameters = hyperparameters
+        self.start_params = None
 
     def train(self, X, y):
         raise NotImplementedError("Subclass of Model should implement train")
@@ -11,6 +26,17 @@ class MachineLearning():
     def reset(self):
         raise NotImplementedError("Subclass of Model should implement reset")
 
+    def walk_forward(self, X, y):
+        raise NotImplementedError("Subclass of Model should implement walk_forward to be evaluated walk forward")
+
+    def carried_params(self, names, default, carried):
+        # Starting values of a warm started fit: default(), the fold's own starting values of the parameters names, 
+        # with the parameters for which carried(name) is true taken from the previous fold. None for a cold fit, 
+        # which computes its own starting values. 
+        if not self.warm_start or self.start_params is None:
+            return None
+        return [self.start_params.get(name, value) if carried(name) else value for name, value in zip(names, default())]
+
 class DecisionTree(MachineLearning):
     from sklearn.tree import DecisionTreeRegressor
     def __init__(self, hyperparameters: dict):
@@ -62,7 +88,30 @@ class XGBoost(MachineLearning):
     def reset(self):
         self.model = self.XGBRegressor(**self.hyperparameters)
 
+def kalman_walk_forward(fitted_model, y, horizon: int):
+    # Forecast of each test point horizon steps ahead, from the Kalman filter state after the target horizon steps before it. 
+    # The test window is filtered once with the fitted parameters, and each predicted state is moved horizon - 1 more steps 
+    # with the time-invariant transition, so the forecast of test point i only uses the targets up to i - horizon. 
+    n_train = len(fitted_model.model.endog)
+    if n_train < horizon:
+        raise ValueError(f"The training window has {n_train} rows, fewer than the horizon {horizon}.")
+    results = fitted_model.append(y).filter_results
+    transition = results.transition[:, :, 0]
+    state_intercept = results.state_intercept[:, 0]
+    # State predicted for the step after each origin i - horizon, moved to i 
+    states = results.predicted_state[:, n_train - horizon + 1:n_train - horizon + 1 + len(y)]
+    for _ in range(horizon - 1):
+        states = transition @ states + state_intercept[:, None]
+    obs_intercept = results.obs_intercept[0, n_train:n_train + len(y)] if results.obs_intercept.shape[1] > 1 else results.obs_intercept[0, 0]
+    return (results.design[0, :, 0] @ states + obs_intercept).reshape(-1, 1)
+
+def is_scale_free(name: str):
+    # AR and MA coefficients of a statsmodels ARIMA, unlike the trend and sigma2, do not depend on the scale of the target 
+    return name.startswith(("ar.", "ma."))
+
 class ARMA(MachineLearning):
+    supports_warm_start = True
+    supports_one_step = True
     from statsmodels.tsa.arima.model import ARIMA
 
     def __init__(self, hyperparameters: dict):
@@ -75,18 +124,26 @@ class ARMA(MachineLearning):
         p = self.hyperparameters.get("p", 1)
         q = self.hyperparameters.get("q", 1)
 
-        self.model = self.ARIMA(
+        model = self.ARIMA(
             y,
             order=(p, 0, q)
-        ).fit()
+        )
+        self.model = model.fit(start_params=self.carried_params(model.param_names, lambda: model.start_params, is_scale_free))
+        if self.warm_start:
+            self.start_params = dict(zip(model.param_names, self.model.params))
 
     def __call__(self, X):
         return self.model.forecast(steps=len(X)).reshape((-1,1))
 
+    def walk_forward(self, X, y):
+        return kalman_walk_forward(self.model, y.reshape(-1), self.horizon)
+
     def reset(self):
         self.model = None
 
 class AR1(MachineLearning):
+    supports_warm_start = True
+    supports_one_step = True
     from statsmodels.tsa.arima.model import ARIMA
     import numpy as np
 
@@ -104,18 +161,25 @@ class AR1(MachineLearning):
             enforce_stationarity=self.hyperparameters.get("enforce_stationarity", True),
             enforce_invertibility=self.hyperparameters.get("enforce_invertibility", True)
         )
-        self.fitted_model = self.model.fit()
+        self.fitted_model = self.model.fit(start_params=self.carried_params(self.model.param_names, lambda: self.model.start_params, is_scale_free))
+        if self.warm_start:
+            self.start_params = dict(zip(self.model.param_names, self.fitted_model.params))
 
     def __call__(self, X):
         steps = len(X)
         forecast = self.fitted_model.forecast(steps=steps)
         return forecast.reshape(-1, 1)
 
+    def walk_forward(self, X, y):
+        return kalman_walk_forward(self.fitted_model, y.reshape(-1), self.horizon)
+
     def reset(self):
         self.model = None
         self.fitted_model = None
 
 class ARIMA(MachineLearning):
+    supports_warm_start = True
+    supports_one_step = True
     from statsmodels.tsa.arima.model import ARIMA
 
     def __init__(self, hyperparameters: dict):
@@ -136,19 +200,28 @@ class ARIMA(MachineLearning):
             enforce_stationarity=self.hyperparameters.get("enforce_stationarity", True),
             enforce_invertibility=self.hyperparameters.get("enforce_invertibility", True)
         )
-        self.fitted_model = self.model.fit()
+        self.fitted_model = self.model.fit(start_params=self.carried_params(self.model.param_names, lambda: self.model.start_params, is_scale_free))
+        if self.warm_start:
+            self.start_params = dict(zip(self.model.param_names, self.fitted_model.params))
 
     def __call__(self, X):
         steps = len(X)
         forecast = self.fitted_model.forecast(steps=steps)
         return forecast.reshape(-1, 1)
 
+    def walk_forward(self, X, y):
+        return kalman_walk_forward(self.fitted_model, y.reshape(-1), self.horizon)
+
     def reset(self):
         self.model = None
         self.fitted_model = None
 
+import numpy as np
 from arch.univariate import arch_model
+from arch.univariate import ConstantMean, ZeroMean, GARCH as GARCHVolatility
 class GARCH(MachineLearning):
+    supports_warm_start = True
+    supports_one_step = True
 
     def __init__(self, hyperparameters: dict):
         super().__init__(hyperparameters)
@@ -162,7 +235,34 @@ class GARCH(MachineLearning):
             y,
             **self.hyperparameters
         )
-        self.fitted_model = self.model.fit(disp="off")
+        self.fitted_model = self.model.fit(disp="off", starting_values=self.starting_values())
+        if self.warm_start:
+            self.start_params = self.fitted_model.params.to_dict()
+
+    def starting_values(self):
+        # Warm started fits keep the ARCH and GARCH coefficients of the previous fold, which do not depend on the scale of the 
+        # target. The constant mean starts from the fold's mean, omega from the one that matches the variance of the fold's 
+        # residuals with the carried persistence, and the distribution from its own starting values on the residuals 
+        # standardized by that variance, as in a cold fit. Other mean models and volatility processes start cold. 
+        volatility = self.model.volatility
+        if not isinstance(volatility, GARCHVolatility) or not isinstance(self.model, (ZeroMean, ConstantMean)):
+            return None
+        names = volatility.parameter_names()
+        params = self.carried_params(names, lambda: [np.nan] * len(names), lambda name: name != "omega")
+        if params is None:
+            return None
+
+        y = np.asarray(self.model.y, dtype=float)
+        mean = [y.mean()] if isinstance(self.model, ConstantMean) else []
+        residuals = y - y.mean() if mean else y
+        persistence = sum(value for name, value in zip(names, params) if name.startswith(("alpha", "beta"))) \
+            + 0.5 * sum(value for name, value in zip(names, params) if name.startswith("gamma"))
+        params[names.index("omega")] = np.mean(np.abs(residuals) ** volatility.power) * max(1 - persistence, 1e-6)
+
+        sigma2 = np.zeros_like(residuals)
+        volatility.compute_variance(np.array(params), residuals, sigma2, volatility.backcast(residuals), volatility.variance_bounds(residuals))
+        distribution = self.model.distribution.starting_values(residuals / np.sqrt(sigma2))
+        return np.concatenate([mean, params, distribution])
 
     def __call__(self, X):
         steps = len(X)
@@ -170,6 +270,17 @@ class GARCH(MachineLearning):
         variance = forecast.variance.values[-1, :]
         return variance.reshape(-1, 1)
 
+    def walk_forward(self, X, y):
+        # One pass of the variance recursion over the training and test windows with the fitted parameters fixed, and the 
+        # variance of each test point forecast horizon steps ahead from the origin horizon steps before it 
+        y = y.reshape(-1)
+        train_y = np.asarray(self.fitted_model.model.y)
+        if len(train_y) < self.horizon:
+            raise ValueError(f"The training window has {len(train_y)} rows, fewer than the horizon {self.horizon}.")
+        fixed = arch_model(np.concatenate([train_y, y]), **self.hyperparameters).fix(self.fitted_model.params)
+        forecast = fixed.forecast(horizon=self.horizon, start=len(train_y) - self.horizon, reindex=False)
+        return forecast.variance.values[:len(y), -1].reshape(-1, 1)
+
     def reset(self):
         self.model = None
         self.fitted_model = None
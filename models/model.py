@@ -1,6 +1,6 @@
 from .machine_learning import LinearRegression, XGBoost, DecisionTree, ARMA, AR1, ARIMA, GARCH, Persistence
 
-def create_model(algorithm_name:str, hyperparameters:dict, seed:int = 1337):
+def create_model(algorithm_name:str, hyperparameters:dict, seed:int = 1337, warm_start:bool = False, one_step:bool = False, horizon:int = 1):
     model = None
     if algorithm_name == "Linear Regression":
         model = LinearRegression(hyperparameters)
@@ -23,6 +23,16 @@ def create_model(algorithm_name:str, hyperparameters:dict, seed:int = 1337):
         model = GARCH(hyperparameters)
     elif algorithm_name == "Persistent":
         model = Persistence(hyperparameters)
+    if model is not None:
+        if warm_start and not model.supports_warm_start:
+            raise ValueError(f"{algorithm_name} does not support warm start, only models fitted from starting values do.")
+        if one_step and not model.supports_one_step:
+            raise ValueError(f"{algorithm_name} does not support one step forecasts, only ARMA, AR1, ARIMA and GARCH do.")
+        # Each fold starts from the parameters fitted on the previous one 
+        model.warm_start = warm_start
+        # The test window is forecast horizon steps ahead with the fitted parameters, instead of all at once 
+        model.one_step = one_step
+        model.horizon = horizon
     return model
     
 
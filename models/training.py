@@ -0,0 +1,140 @@
+import copy
+import numpy as np
+import pandas as pd
+
+from datasets.preprocess import Preprocess
+from datasets.shared_frame import share_array, attach_array
+
+
+def fold_rows(data: pd.DataFrame, idx: np.ndarray):
+    # Rows of a fold, as a slice instead of a copy when the indices are contiguous, like the expanding windows of TimeSeriesFold 
+    idx = np.asarray(idx)
+    if idx.size > 0 and idx[-1] - idx[0] == idx.size - 1 and np.all(np.diff(idx) == 1):
+        return data.iloc[idx[0]:idx[-1] + 1]
+    return data.iloc[idx]
+
+
+class PreparedFolds():
+    # Folds scaled once and shared by every model: the transformed train and test features, the transformed train target, 
+    # and the Preprocess fitted on the fold, kept for inverse_transform. Folds are prepared the first time they are used. 
+    def __init__(self, data_features: pd.DataFrame, data_target: pd.DataFrame, train_indices, test_indices, prep_config: dict):
+        self.data_features = data_features
+        self.data_target = data_target
+        self.train_indices = train_indices
+        self.test_indices = test_indices
+        self.prep_config = prep_config
+        self.folds = {}
+
+    def __len__(self):
+        return len(self.test_indices)
+
+    def __getitem__(self, fold_idx: int):
+        if fold_idx not in self.folds:
+            self.folds[fold_idx] = self.prepare(fold_idx)
+        return self.folds[fold_idx]
+
+    def prepare(self, fold_idx: int):
+        train_idx = self.train_indices[fold_idx]
+        test_idx = self.test_indices[fold_idx]
+        X_train = fold_rows(self.data_features, train_idx)
+        X_test = fold_rows(self.data_features, test_idx)
+        y_train = fold_rows(self.data_target, train_idx)
+        y_test = fold_rows(self.data_target, test_idx)
+
+        feat_prep = Preprocess(self.prep_config["FEATURES"])
+        target_prep = Preprocess(self.prep_config["TARGET"])
+        X_train, X_test = feat_prep.transform_dataset(X_train, X_test, y_train)
+        y_train = target_prep.fit_transform(y_train)
+        # Input of the one step ahead forecasts, on the scale the model is fitted on 
+        y_test = target_prep.transform(y_test)
+
+        # Shared by every model, so none of them can modify the fold in place 
+        for array in (X_train, X_test, y_train, y_test):
+            if isinstance(array, np.ndarray):
+                array.setflags(write=False)
+        return {"X_train": X_train, "X_test": X_test, "y_train": y_train, "y_test": y_test, "feat_prep": feat_prep, "target_prep": target_prep}
+
+
+def train_fold(model, fold: dict):
+    # Fits the model on one prepared fold, returns the test predictions and the fold's fitted preprocessing 
+    model.reset()
+    model.train(fold["X_train"], fold["y_train"])
+    if model.one_step:
+        y_hat = model.walk_forward(fold["X_test"], fold["y_test"])
+    else:
+        y_hat = model(fold["X_test"])
+    y_hat = fold["target_prep"].inverse_transform(y_hat)
+
+    return y_hat, fold["feat_prep"], fold["target_prep"]
+
+
+def share_folds(folds: PreparedFolds):
+    # Prepares every fold once and copies its arrays into shared memory, so worker processes attach to the same scaled folds 
+    # instead of each preparing its own copy. Each fold is dropped from folds once shared, so the parent holds one at a time. 
+    # Returns the blocks, which the caller closes and unlinks when done, and a picklable spec per fold for SharedFolds. 
+    blocks = []
+    specs = []
+    for fold_idx in range(len(folds)):
+        fold = folds.folds.pop(fold_idx, None) or folds.prepare(fold_idx)
+        spec = {"arrays": {}, "feat_prep": fold["feat_prep"], "target_prep": fold["target_prep"]}
+        for name in ("X_train", "X_test", "y_train", "y_test"):
+            block, spec["arrays"][name] = share_array(np.asarray(fold[name]))
+            blocks.append(block)
+        specs.append(spec)
+    return blocks, specs
+
+
+class SharedFolds():
+    # Folds shared by share_folds, attached as read-only zero-copy views the first time they are used 
+    def __init__(self, specs: list):
+        self.specs = specs
+        self.folds = {}
+        self.blocks = []
+
+    def __len__(self):
+        return len(self.specs)
+
+    def __getitem__(self, fold_idx: int):
+        if fold_idx not in self.folds:
+            spec = self.specs[fold_idx]
+            fold = {"feat_prep": spec["feat_prep"], "target_prep": spec["target_prep"]}
+            for name, array_spec in spec["arrays"].items():
+                fold[name], block = attach_array(array_spec)
+                self.blocks.append(block)
+            self.folds[fold_idx] = fold
+        return self.folds[fold_idx]
+
+
+# Data of a worker process, attached once by init_worker and used by every task it runs 
+WORKER_STATE = {}
+
+
+def init_worker(fold_specs: list, save: bool):
+    WORKER_STATE.update({
+        # Every worker uses the folds prepared once by the main process 
+        "folds": SharedFolds(fold_specs),
+        "save": save
+    })
+
+
+def train_folds_task(task: tuple):
+    # Several folds of one model, in order, so each warm started fit starts from the previous one. 
+    # Returns the result of each fold and the parameters the next fold would start from. 
+    model, fold_idxs = task
+    results = []
+    for fold_idx in fold_idxs:
+        y_hat, fitted_model, feat_prep, target_prep = train_fold_task((model, fold_idx))
+        # The model is trained again on the next fold, saved models are copied as they are after this one 
+        if fitted_model is not None:
+            fitted_model = copy.deepcopy(fitted_model)
+        results.append((y_hat, fitted_model, feat_prep, target_prep))
+    return results, model.start_params
+
+
+def train_fold_task(task: tuple):
+    # One (model, fold) cell of the grid. The fitted model and preprocessing only go back to the main process when they are saved. 
+    model, fold_idx = task
+    y_hat, feat_prep, target_prep = train_fold(model, WORKER_STATE["folds"][fold_idx])
+    if not WORKER_STATE["save"]:
+        return y_hat, None, None, None
+    return y_hat, model, feat_prep, target_prep
@@ -0,0 +1,324 @@
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def jit(function):
+    # Compiled in nopython mode when numba is installed, plain Python otherwise 
+    return numba.njit(cache=True)(function) if numba is not None else function
+
+
+# Event kinds of run_events 
+SUBMIT, CANCEL, STEP, MARKET = 0, 1, 2, 3
+
+# Columns of the orders array, one row per order id (minus the id offset) 
+SIDE, LEVEL, REMAINING, PREV, NEXT, EXPIRY = 0, 1, 2, 3, 4, 5
+N_ORDER_FIELDS = 6
+
+# Columns of the levels array, one row per price level (minus the level offset) and side 
+HEAD, TAIL, VOLUME = 0, 1, 2
+
+# Entries of the state array 
+NEXT_ID, TIME, BEST_BID, BEST_ASK, TRADED, EXPIRY_ID, LEVEL_OFFSET, TTL, ID_OFFSET, BID_VOLUME, ASK_VOLUME = range(11)
+N_STATE = 11
+
+NO_LEVEL = np.iinfo(np.int64).min
+NO_ORDER = -1
+
+
+@jit
+def rescan(levels, state, side):
+    # Moves the best level of a side to the next non-empty level away from the spread, after its best level emptied 
+    if state[BID_VOLUME + side] == 0:
+        state[BEST_BID + side] = NO_LEVEL
+        return
+    offset = state[LEVEL_OFFSET]
+    i = state[BEST_BID + side] - offset
+    step = -1 if side == 0 else 1
+    while levels[side, i, VOLUME] == 0:
+        i += step
+    state[BEST_BID + side] = i + offset
+
+
+@jit
+def unlink(orders, levels, state, order_id):
+    # Removes a resting order from its level queue, and the level from the best levels once it is empty 
+    id_offset = state[ID_OFFSET]
+    row = order_id - id_offset
+    side = orders[row, SIDE]
+    i = orders[row, LEVEL] - state[LEVEL_OFFSET]
+    prev = orders[row, PREV]
+    next_id = orders[row, NEXT]
+    if prev == NO_ORDER:
+        levels[side, i, HEAD] = next_id
+    else:
+        orders[prev - id_offset, NEXT] = next_id
+    if next_id == NO_ORDER:
+        levels[side, i, TAIL] = prev
+    else:
+        orders[next_id - id_offset, PREV] = prev
+
+    remaining = orders[row, REMAINING]
+    orders[row, REMAINING] = 0
+    levels[side, i, VOLUME] -= remaining
+    state[BID_VOLUME + side] -= remaining
+    if levels[side, i, VOLUME] == 0 and orders[row, LEVEL] == state[BEST_BID + side]:
+        rescan(levels, state, side)
+
+
+@jit
+def match(orders, levels, state, side, level, size, market):
+    # Same as LimitOrderBook.match: crosses against the opposite side in price-time priority and returns the size left 
+    opposite = 1 - side
+    id_offset = state[ID_OFFSET]
+    level_offset = state[LEVEL_OFFSET]
+    while size > 0:
+        best = state[BEST_BID + opposite]
+        if best == NO_LEVEL:
+            break
+        if not market and (best > level if side == 0 else best < level):
+            break
+
+        i = best - level_offset
+        level_filled = 0
+        while size > 0 and levels[opposite, i, HEAD] != NO_ORDER:
+            maker = levels[opposite, i, HEAD] - id_offset
+            filled = size if size < orders[maker, REMAINING] else orders[maker, REMAINING]
+            orders[maker, REMAINING] -= filled
+            size -= filled
+            level_filled += filled
+            if orders[maker, REMAINING] == 0:
+                next_id = orders[maker, NEXT]
+                levels[opposite, i, HEAD] = next_id
+                if next_id == NO_ORDER:
+                    levels[opposite, i, TAIL] = NO_ORDER
+                else:
+                    orders[next_id - id_offset, PREV] = NO_ORDER
+
+        state[TRADED] += level_filled
+        levels[opposite, i, VOLUME] -= level_filled
+        state[BID_VOLUME + opposite] -= level_filled
+        if levels[opposite, i, VOLUME] == 0:
+            rescan(levels, state, opposite)
+    return size
+
+
+@jit
+def rest(orders, levels, state, side, level, size):
+    # Appends an order to the queue of its level, returns its order id 
+    order_id = state[NEXT_ID]
+    state[NEXT_ID] += 1
+    row = order_id - state[ID_OFFSET]
+    i = level - state[LEVEL_OFFSET]
+    tail = levels[side, i, TAIL]
+    orders[row, SIDE] = side
+    orders[row, LEVEL] = level
+    orders[row, REMAINING] = size
+    orders[row, PREV] = tail
+    orders[row, NEXT] = NO_ORDER
+    orders[row, EXPIRY] = state[TIME] + state[TTL] if state[TTL] >= 0 else -1
+    if tail == NO_ORDER:
+        levels[side, i, HEAD] = order_id
+    else:
+        orders[tail - state[ID_OFFSET], NEXT] = order_id
+    levels[side, i, TAIL] = order_id
+    levels[side, i, VOLUME] += size
+    state[BID_VOLUME + side] += size
+
+    best = state[BEST_BID + side]
+    if best == NO_LEVEL or (level > best if side == 0 else level < best):
+        state[BEST_BID + side] = level
+    return order_id
+
+
+@jit
+def run_events(orders, levels, state, kinds, sides, event_levels, sizes, order_ids, results, start):
+    # Replays events from start: SUBMIT (side, level, size) returns the resting order id or -1 when filled, 
+    # CANCEL (order id) returns 1 when the order was resting, STEP advances the clock and expires orders, 
+    # MARKET (side, size) returns the filled size. Stops before a submit that needs more order rows or a level 
+    # outside of the levels array, and returns the index of the next event to run. 
+    n_rows = orders.shape[0]
+    n_levels = levels.shape[1]
+    for e in range(start, kinds.shape[0]):
+        kind = kinds[e]
+        if kind == SUBMIT:
+            i = event_levels[e] - state[LEVEL_OFFSET]
+            if i < 0 or i >= n_levels or state[NEXT_ID] - state[ID_OFFSET] >= n_rows:
+                return e
+            size = match(orders, levels, state, sides[e], event_levels[e], sizes[e], False)
+            results[e] = rest(orders, levels, state, sides[e], event_levels[e], size) if size > 0 else -1
+        elif kind == CANCEL:
+            order_id = order_ids[e]
+            results[e] = 0
+            if order_id >= state[ID_OFFSET] and order_id < state[NEXT_ID] and orders[order_id - state[ID_OFFSET], REMAINING] > 0:
+                unlink(orders, levels, state, order_id)
+                results[e] = 1
+        elif kind == STEP:
+            state[TIME] += 1
+            results[e] = 0
+            if state[TTL] >= 0:
+                # Orders are submitted in time order with the same ttl, so they also expire in order of their id 
+                order_id = max(state[EXPIRY_ID], state[ID_OFFSET])
+                while order_id < state[NEXT_ID] and orders[order_id - state[ID_OFFSET], EXPIRY] <= state[TIME]:
+                    if orders[order_id - state[ID_OFFSET], REMAINING] > 0:
+                        unlink(orders, levels, state, order_id)
+                    order_id += 1
+                state[EXPIRY_ID] = order_id
+        else:
+            results[e] = sizes[e] - match(orders, levels, state, sides[e], 0, sizes[e], True)
+    return kinds.shape[0]
+
+
+class ArrayLimitOrderBook():
+    # Same book as LimitOrderBook, stored in NumPy arrays and stepped by the compiled run_events: each order is a row 
+    # of a doubly linked FIFO queue per level, so cancels unlink in O(1), and levels are rows of a dense array around 
+    # the price, where the best level of a side moves to the next non-empty level when it empties. Every operation is a 
+    # batch of events, so a whole step or a replay of events runs in a single compiled call. The arrays grow as needed, 
+    # and the rows of the oldest orders are reused once they are filled, cancelled or expired. 
+    def __init__(self, tick_size: float, starting_price: float, ttl: int = None, n_orders: int = 1 << 16, n_levels: int = 1024):
+        self.tick_size = tick_size
+        self.current_price = starting_price
+        self.ttl = ttl # number of steps an order rests before expiring, None to never expire 
+        self.n_orders = n_orders
+        self.n_levels = n_levels
+        self.clear()
+
+
+    def clear(self):
+        self.orders = np.zeros((self.n_orders, N_ORDER_FIELDS), dtype=np.int64)
+        self.levels = np.full((2, self.n_levels, 3), NO_ORDER, dtype=np.int64)
+        self.levels[:, :, VOLUME] = 0
+        self.state = np.zeros(N_STATE, dtype=np.int64)
+        self.state[[BEST_BID, BEST_ASK]] = NO_LEVEL
+        self.state[TTL] = -1 if self.ttl is None else self.ttl
+        # Levels array centered on the current price 
+        self.state[LEVEL_OFFSET] = self.reference_level() - self.n_levels // 2
+
+    @property
+    def traded_volume(self):
+        return int(self.state[TRADED])
+
+    @property
+    def time(self):
+        return int(self.state[TIME])
+
+
+    def run(self, kinds: np.ndarray, sides: np.ndarray, levels: np.ndarray, sizes: np.ndarray, order_ids: np.ndarray):
+        # Replays a batch of events, see run_events, and returns the result of each event 
+        kinds, sides, levels, sizes, order_ids = (np.ascontiguousarray(column, dtype=np.int64)
+                                                  for column in (kinds, sides, levels, sizes, order_ids))
+        results = np.empty(kinds.size, dtype=np.int64)
+        start = 0
+        while True:
+            start = run_events(self.orders, self.levels, self.state, kinds, sides, levels, sizes, order_ids, results, start)
+            if start == kinds.size:
+                return results
+            self.make_room(int(levels[start]))
+
+    def make_room(self, level: int):
+        # Widens the levels array to include level, and reuses or adds order rows when they are all used 
+        offset = int(self.state[LEVEL_OFFSET])
+        n_levels = self.levels.shape[1]
+        if level < offset or level >= offset + n_levels:
+            new_offset = min(offset, level - n_levels // 2)
+            new_n_levels = max(offset + n_levels, level + n_levels // 2) - new_offset
+            levels = np.full((2, new_n_levels, 3), NO_ORDER, dtype=np.int64)
+            levels[:, :, VOLUME] = 0
+            levels[:, offset - new_offset:offset - new_offset + n_levels] = self.levels
+            self.levels = levels
+            self.state[LEVEL_OFFSET] = new_offset
+
+        id_offset = int(self.state[ID_OFFSET])
+        n_used = int(self.state[NEXT_ID]) - id_offset
+        if n_used >= self.orders.shape[0]:
+            # Rows before the oldest resting order are not referenced anymore 
+            resting = np.flatnonzero(self.orders[:n_used, REMAINING] > 0)
+            first = resting[0] if resting.size else n_used
+            if first >= n_used // 2:
+                self.orders[:n_used - first] = self.orders[first:n_used]
+                self.state[ID_OFFSET] = id_offset + first
+            else:
+                self.orders = np.concatenate((self.orders, np.zeros_like(self.orders)))
+
+    def events(self, kind: int, n: int):
+        # Columns of n events of the same kind, filled in by the caller 
+        return np.full(n, kind, dtype=np.int64), np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64), \
+               np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64)
+
+
+    def submit(self, side: int, level: int, size: int):
+        # Returns the order_id of the resting order, or None when it was filled 
+        order_id = int(self.run([SUBMIT], [side], [level], [size], [0])[0])
+        return None if order_id < 0 else order_id
+
+    def market(self, side: int, size: int):
+        return int(self.run([MARKET], [side], [0], [size], [0])[0])
+
+    def cancel(self, order_id: int):
+        return bool(self.run([CANCEL], [0], [0], [0], [order_id])[0])
+
+    def step(self):
+        self.run([STEP], [0], [0], [0], [0])
+
+    def cancel_batch(self, order_ids: list):
+        kinds, sides, levels, sizes, ids = self.events(CANCEL, len(order_ids))
+        ids[:] = order_ids
+        self.run(kinds, sides, levels, sizes, ids)
+
+    def market_batch(self, sides: np.ndarray, sizes: np.ndarray):
+        kinds, _, levels, _, order_ids = self.events(MARKET, len(sides))
+        return int(self.run(kinds, sides, levels, sizes, order_ids).sum())
+
+
+    def reference_level(self):
+        return round(self.current_price / self.tick_size)
+
+    def update(self, side: int, delta_distance : int, size: int):
+        reference = self.reference_level()
+        return self.submit(side, reference - delta_distance if side == 0 else reference + delta_distance, size)
+
+    def update_batch(self, sides: np.ndarray, delta_distances: np.ndarray, sizes: np.ndarray):
+        # Returns the order ids of the orders left resting 
+        reference = self.reference_level()
+        kinds, _, _, _, order_ids = self.events(SUBMIT, len(sides))
+        levels = np.where(sides == 0, reference - delta_distances, reference + delta_distances)
+        results = self.run(kinds, sides, levels, sizes, order_ids)
+        return results[results >= 0].tolist()
+
+
+    def best_level(self, side: int):
+        level = int(self.state[BEST_BID + side])
+        return None if level == NO_LEVEL else level
+
+    def best_bid(self):
+        level = self.best_level(0)
+        return None if level is None else level * self.tick_size
+
+    def best_ask(self):
+        level = self.best_level(1)
+        return None if level is None else level * self.tick_size
+
+    def midprice(self):
+        return (self.best_ask() + self.best_bid()) / 2
+
+    def microprice(self):
+        # Falls back to the current price while a side of the book is empty 
+        best_bid = self.best_level(0)
+        best_ask = self.best_level(1)
+        if best_bid is None or best_ask is None:
+            return self.current_price
+
+        offset = int(self.state[LEVEL_OFFSET])
+        best_bid_size = int(self.levels[0, best_bid - offset, VOLUME])
+        best_ask_size = int(self.levels[1, best_ask - offset, VOLUME])
+        numerator = best_ask * best_bid_size + best_bid * best_ask_size
+        denominator = best_ask_size + best_bid_size
+
+        return numerator / denominator * self.tick_size
+
+
+    def set_currentprice(self, price: float):
+        self.current_price = price
@@ -0,0 +1,45 @@
+import numpy as np
+
+from .bounded_order_book import BoundedOrderBook
+
+
+class ArrayOrderBook(BoundedOrderBook):
+    def __init__(self, tick_size: float, starting_price: float, max_delta: int):
+        self.max_delta = max_delta
+
+        # Volume per delta_distance for bids (row 0) and asks (row 1), delta_distance is capped by max_delta 
+        self.order_book = np.zeros((2, max_delta + 1), dtype=np.int64)
+        super().__init__(tick_size, starting_price)
+
+
+    def clear(self):
+        # Zero in place instead of reallocating the book on every step 
+        self.order_book.fill(0)
+        self.best_bid_distance = None # higher better 
+        self.best_ask_distance = None # lower better 
+
+
+    def update(self, side: int, delta_distance : int, size: int):
+        self.order_book[side, delta_distance] += size
+
+        if side == 0 and (self.best_bid_distance is None or delta_distance < self.best_bid_distance):
+            self.best_bid_distance = delta_distance
+
+        if side == 1 and (self.best_ask_distance is None or delta_distance < self.best_ask_distance):
+            self.best_ask_distance = delta_distance
+
+    def update_batch(self, sides: np.ndarray, delta_distances: np.ndarray, sizes: np.ndarray):
+        np.add.at(self.order_book, (sides, delta_distances), sizes)
+
+        # The best level is set by the closest order, even when its size is 0 
+        bid_distances = delta_distances[sides == 0]
+        if bid_distances.size:
+            best_distance = int(bid_distances.min())
+            if self.best_bid_distance is None or best_distance < self.best_bid_distance:
+                self.best_bid_distance = best_distance
+
+        ask_distances = delta_distances[sides == 1]
+        if ask_distances.size:
+            best_distance = int(ask_distances.min())
+            if self.best_ask_distance is None or best_distance < self.best_ask_distance:
+                self.best_ask_distance = best_distance
@@ -1,3 +1,6 @@
+import numpy as np
+
+
 class BoundedOrderBook():
     def __init__(self, tick_size: float, starting_price: float):
         self.clear()
@@ -25,7 +28,25 @@ class BoundedOrderBook():
 
         if side == 1 and (self.best_ask_distance is None or delta_distance < self.best_ask_distance):
             self.best_ask_distance = delta_distance
-        
+
+    def update_batch(self, sides: np.ndarray, delta_distances: np.ndarray, sizes: np.ndarray):
+        # Equivalent to calling update for every order, using a single bincount over (delta_distance, side) 
+        keys = 2 * delta_distances + sides
+        # Count orders as well as volume, since an order of size 0 still creates a level 
+        counts = np.bincount(keys)
+        volumes = np.bincount(keys, weights=sizes)
+
+        levels = np.flatnonzero(counts)
+        for key, size in zip(levels.tolist(), volumes[levels].astype(np.int64).tolist()):
+            delta_distance, side = divmod(key, 2)
+            book_side = self.order_book[side]
+            book_side[delta_distance] = book_side.get(delta_distance, 0) + size
+
+            if side == 0 and (self.best_bid_distance is None or delta_distance < self.best_bid_distance):
+                self.best_bid_distance = delta_distance
+
+            if side == 1 and (self.best_ask_distance is None or delta_distance < self.best_ask_distance):
+                self.best_ask_distance = delta_distance
 
     def best_bid(self):
         # current price - best distance * tick size 
@@ -45,6 +66,23 @@ class BoundedOrderBook():
         denominator = best_ask_size + best_bid_size
 
         return numerator / denominator if denominator != 0 else 0
+
+    def microprice_path(self, best_bid_distances: np.ndarray, best_bid_sizes: np.ndarray,
+                        best_ask_distances: np.ndarray, best_ask_sizes: np.ndarray):
+        # Microprices of consecutive steps starting from current_price, given each step's best levels. 
+        # Since best_ask = p + da * tick and best_bid = p - db * tick, the microprice is p + tick * (da*bs - db*as) / (as + bs). 
+        denominator = best_ask_sizes + best_bid_sizes
+        valid = denominator != 0
+        increments = np.zeros(denominator.shape)
+        increments[valid] = self.tick_size * (best_ask_distances * best_bid_sizes - best_bid_distances * best_ask_sizes)[valid] / denominator[valid]
+
+        # microprice returns 0 when both best sizes are 0, so the path restarts from 0 at those steps 
+        prices = np.zeros(denominator.shape)
+        start, price = 0, self.current_price
+        for stop in np.append(np.flatnonzero(~valid), denominator.size).tolist():
+            prices[start:stop] = np.cumsum(np.concatenate(([price], increments[start:stop])))[1:]
+            start, price = stop + 1, 0.0
+        return prices
     
     
     def set_currentprice(self, price: float):
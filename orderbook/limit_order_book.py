@@ -0,0 +1,187 @@
+import heapq
+from collections import deque
+import numpy as np
+
+
+class LimitOrderBook():
+    # Order book where orders rest across steps until they are matched, cancelled or expire. 
+    # Prices are integer levels (multiples of tick_size), each level holds a FIFO queue of orders, 
+    # and each side keeps a heap of its levels so the best level is found in O(log n). 
+    def __init__(self, tick_size: float, starting_price: float, ttl: int = None):
+        self.tick_size = tick_size
+        self.current_price = starting_price
+        self.ttl = ttl # number of steps an order rests before expiring, None to never expire 
+        self.clear()
+
+
+    def clear(self):
+        self.time = 0
+        self.next_order_id = 0
+        self.orders = {} # order_id: [side, level, remaining size] 
+        self.queues = ({}, {}) # bids and asks, level: deque of order ids, oldest first 
+        self.volumes = ({}, {}) # bids and asks, level: resting volume 
+        self.levels = ([], []) # bids and asks, heap of levels, bids are negated so both heaps pop the best level first 
+        self.expiries = deque() # (expiry time, order_id) in submission order, so also in expiry order 
+        self.traded_volume = 0
+
+
+    def best_level(self, side: int):
+        # Levels are removed from the heap lazily, once they are found empty at the top 
+        heap = self.levels[side]
+        volumes = self.volumes[side]
+        while heap:
+            level = -heap[0] if side == 0 else heap[0]
+            if level in volumes:
+                return level
+            heapq.heappop(heap)
+        return None
+
+    def match(self, side: int, level: int, size: int):
+        # Crosses an order against the opposite side while it is marketable, in price-time priority, and returns 
+        # the size left. A level of None has no limit price, as for a market order. 
+        orders = self.orders
+        opposite = 1 - side
+        opposite_volumes = self.volumes[opposite]
+        opposite_heap = self.levels[opposite]
+
+        while size > 0 and opposite_heap:
+            # Best opposite level, dropping empty levels from the top of the heap 
+            best = -opposite_heap[0] if opposite == 0 else opposite_heap[0]
+            if best not in opposite_volumes:
+                heapq.heappop(opposite_heap)
+                continue
+            if level is not None and (best > level if side == 0 else best < level):
+                break
+
+            queue = self.queues[opposite][best]
+            level_filled = 0
+            while size > 0 and queue:
+                maker = orders.get(queue[0])
+                if maker is None:
+                    # cancelled or expired 
+                    queue.popleft()
+                    continue
+
+                filled = size if size < maker[2] else maker[2]
+                maker[2] -= filled
+                size -= filled
+                level_filled += filled
+                if maker[2] == 0:
+                    del orders[queue.popleft()]
+
+            self.traded_volume += level_filled
+            opposite_volumes[best] -= level_filled
+            if opposite_volumes[best] == 0:
+                del opposite_volumes[best]
+                del self.queues[opposite][best]
+        return size
+
+    def submit(self, side: int, level: int, size: int):
+        # Crosses the order against the opposite side while it is marketable, then rests what is left. 
+        # Returns the order_id of the resting order, or None when it was filled. 
+        size = self.match(side, level, size)
+        if size <= 0:
+            return None
+
+        order_id = self.next_order_id
+        self.next_order_id += 1
+        self.orders[order_id] = [side, level, size]
+
+        volumes = self.volumes[side]
+        if level in volumes:
+            volumes[level] += size
+            self.queues[side][level].append(order_id)
+        else:
+            volumes[level] = size
+            self.queues[side][level] = deque((order_id,))
+            heapq.heappush(self.levels[side], -level if side == 0 else level)
+
+        if self.ttl is not None:
+            self.expiries.append((self.time + self.ttl, order_id))
+        return order_id
+
+    def market(self, side: int, size: int):
+        # Market order, crossed against the opposite side at any price, what is left once the side is empty is dropped. 
+        # Returns the filled size. 
+        return size - self.match(side, None, size)
+
+    def cancel(self, order_id: int):
+        # Returns False when the order was already filled, cancelled or expired 
+        order = self.orders.pop(order_id, None)
+        if order is None:
+            return False
+
+        side, level, remaining = order
+        volumes = self.volumes[side]
+        volumes[level] -= remaining
+        if volumes[level] == 0:
+            del volumes[level]
+            del self.queues[side][level]
+        return True
+
+    def step(self):
+        # Advances the clock by one step and expires the orders that reached their ttl 
+        self.time += 1
+        expiries = self.expiries
+        while expiries and expiries[0][0] <= self.time:
+            self.cancel(expiries.popleft()[1])
+
+
+    def cancel_batch(self, order_ids: list):
+        for order_id in order_ids:
+            self.cancel(order_id)
+
+    def market_batch(self, sides: np.ndarray, sizes: np.ndarray):
+        # Returns the total filled size 
+        return sum(self.market(side, size) for side, size in zip(sides.tolist(), sizes.tolist()))
+
+
+    def reference_level(self):
+        return round(self.current_price / self.tick_size)
+
+    def update(self, side: int, delta_distance : int, size: int):
+        # Same interface as BoundedOrderBook: bids are placed delta_distance levels below the current price, asks above 
+        reference = self.reference_level()
+        return self.submit(side, reference - delta_distance if side == 0 else reference + delta_distance, size)
+
+    def update_batch(self, sides: np.ndarray, delta_distances: np.ndarray, sizes: np.ndarray):
+        # Returns the order ids of the orders left resting 
+        reference = self.reference_level()
+        levels = np.where(sides == 0, reference - delta_distances, reference + delta_distances)
+
+        resting = []
+        for side, level, size in zip(sides.tolist(), levels.tolist(), sizes.tolist()):
+            order_id = self.submit(side, level, size)
+            if order_id is not None:
+                resting.append(order_id)
+        return resting
+
+
+    def best_bid(self):
+        level = self.best_level(0)
+        return None if level is None else level * self.tick_size
+
+    def best_ask(self):
+        level = self.best_level(1)
+        return None if level is None else level * self.tick_size
+
+    def midprice(self):
+        return (self.best_ask() + self.best_bid()) / 2
+
+    def microprice(self):
+        # Falls back to the current price while a side of the book is empty 
+        best_bid = self.best_level(0)
+        best_ask = self.best_level(1)
+        if best_bid is None or best_ask is None:
+            return self.current_price
+
+        best_bid_size = self.volumes[0][best_bid]
+        best_ask_size = self.volumes[1][best_ask]
+        numerator = best_ask * best_bid_size + best_bid * best_ask_size
+        denominator = best_ask_size + best_bid_size
+
+        return numerator / denominator * self.tick_size
+
+
+    def set_currentprice(self, price: float):
+        self.current_price = price
@@ -0,0 +1,26 @@
+import warnings
+
+from .bounded_order_book import BoundedOrderBook
+from .array_order_book import ArrayOrderBook
+from .limit_order_book import LimitOrderBook
+from .array_limit_order_book import ArrayLimitOrderBook, numba
+
+def create_order_book(config: dict, max_delta: int):
+    config = dict(config)
+    order_book_name = config.pop("type", "Bounded")
+
+    order_book = None
+    if order_book_name == "Bounded":
+        order_book = BoundedOrderBook(**config)
+    elif order_book_name == "Array":
+        # The depth of the book is known in advance, since agents cap their distance at max_delta 
+        order_book = ArrayOrderBook(max_delta=max_delta, **config)
+    elif order_book_name == "Limit":
+        # The Numba backend runs submits, matching, cancels and expiries in compiled kernels, 
+        # and falls back to the Python book when numba is not installed. Both give identical paths. 
+        backend = config.pop("backend", "Python")
+        if backend == "Numba" and numba is None:
+            warnings.warn("numba is not installed, falling back to the Python limit order book.")
+            backend = "Python"
+        order_book = ArrayLimitOrderBook(**config) if backend == "Numba" else LimitOrderBook(**config)
+    return order_book
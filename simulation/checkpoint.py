@@ -0,0 +1,33 @@
+import os
+import pickle
+import numpy as np
+
+
+def checkpoint_path(output_path: str):
+    return output_path + ".ckpt"
+
+
+def save_checkpoint(path: str, step: int, agent_group, output_state: dict):
+    # Everything needed to continue bit for bit from `step`: the agent group (agents with their Generators, 
+    # and the order book with its current price and resting orders), the legacy global RNG state, and the output state. 
+    checkpoint = {
+        "step": step,
+        "agent_group": agent_group,
+        "np_random_state": np.random.get_state(),
+        "output": output_state
+    }
+
+    # Written next to the checkpoint then renamed, so a crash never leaves a partial checkpoint 
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        pickle.dump(checkpoint, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: str):
+    with open(path, "rb") as file:
+        checkpoint = pickle.load(file)
+    np.random.set_state(checkpoint["np_random_state"])
+    return checkpoint
@@ -0,0 +1,38 @@
+import json
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from tqdm import tqdm
+
+from .simulator import create_simulation, simulate_blocks
+from datasets.prices import metadata_path
+
+
+def simulate_path(config: dict, output_path: str, path_idx: int, seed_sequence: np.random.SeedSequence):
+    # Each path draws from its own stream, so a path does not depend on which worker runs it 
+    agent_group = create_simulation(config, rng=np.random.default_rng(seed_sequence))
+
+    paths = np.load(output_path, mmap_mode="r+")
+    for start, prices in simulate_blocks(agent_group, config['SIMULATOR']):
+        paths[path_idx, start:start + prices.size] = prices
+    paths.flush()
+
+    return path_idx
+
+
+def simulate_ensemble(config: dict, output_path: str, n_paths: int, n_workers: int = None):
+    # Writes n_paths independent price paths into a (n_paths, n_steps) memory-mapped .npy file 
+    n_steps = config['SIMULATOR']['n_steps']
+    paths = np.lib.format.open_memmap(output_path, mode="w+", dtype=np.float64, shape=(n_paths, n_steps))
+    del paths
+    with open(metadata_path(output_path), "w") as file:
+        json.dump({"n_paths": n_paths, "n_steps": n_steps, "config": config, "seed": config['AGENT_GROUP']['seed']}, file, indent=4)
+
+    seed_sequences = np.random.SeedSequence(config['AGENT_GROUP']['seed']).spawn(n_paths)
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = [executor.submit(simulate_path, config, output_path, path_idx, seed_sequence)
+                   for path_idx, seed_sequence in enumerate(seed_sequences)]
+        for future in tqdm(futures):
+            future.result()
+
+    return np.load(output_path, mmap_mode="r")
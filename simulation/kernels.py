@@ -0,0 +1,74 @@
+import warnings
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def book_microprices_numpy(counts: np.ndarray, sizes: np.ndarray, order_book):
+    # Steps the order book through a block of draws: counts and sizes are (n_steps, 2, max_delta) arrays holding the 
+    # number of orders and their total size per (side, delta_distance) level. 
+    prices = np.empty(counts.shape[0])
+    for t in range(counts.shape[0]):
+        order_book.clear()
+        sides, levels = np.nonzero(counts[t])
+        order_book.update_batch(sides, levels + 1, sizes[t][sides, levels])
+
+        price = order_book.microprice()
+        order_book.set_currentprice(price)
+        prices[t] = price
+    return prices
+
+
+def _book_microprices(counts, sizes, tick_size, price):
+    # Same loop as book_microprices_numpy, written for nopython mode: the best level of each side is 
+    # the closest level with at least one order, and the microprice is computed as in BoundedOrderBook.microprice 
+    n_steps, _, max_delta = counts.shape
+    prices = np.empty(n_steps)
+    for t in range(n_steps):
+        best_bid_distance = 0
+        best_bid_size = 0
+        for d in range(max_delta):
+            if counts[t, 0, d] > 0:
+                best_bid_distance = d + 1
+                best_bid_size = sizes[t, 0, d]
+                break
+
+        best_ask_distance = 0
+        best_ask_size = 0
+        for d in range(max_delta):
+            if counts[t, 1, d] > 0:
+                best_ask_distance = d + 1
+                best_ask_size = sizes[t, 1, d]
+                break
+
+        if best_bid_distance == 0 or best_ask_distance == 0:
+            raise ValueError("A side of the order book received no orders.")
+
+        best_bid = price - best_bid_distance * tick_size
+        best_ask = price + best_ask_distance * tick_size
+        numerator = best_ask * best_bid_size + best_bid * best_ask_size
+        denominator = best_ask_size + best_bid_size
+
+        price = numerator / denominator if denominator != 0 else 0.0
+        prices[t] = price
+    return prices
+
+
+_book_microprices_jit = numba.njit(cache=True)(_book_microprices) if numba is not None else None
+
+
+def book_microprices(counts: np.ndarray, sizes: np.ndarray, order_book, backend: str = "NumPy"):
+    # Runs a block of book updates and microprices with the selected backend, and moves the book to the last price. 
+    # Numba falls back to NumPy when numba is not installed, both give identical paths for the same draws. 
+    if backend == "Numba" and _book_microprices_jit is None:
+        warnings.warn("numba is not installed, falling back to the NumPy backend.")
+        backend = "NumPy"
+
+    if backend == "Numba":
+        prices = _book_microprices_jit(counts, sizes, float(order_book.tick_size), float(order_book.current_price))
+        order_book.set_currentprice(prices[-1])
+        return prices
+    return book_microprices_numpy(counts, sizes, order_book)
@@ -0,0 +1,46 @@
+import numpy as np
+
+from agents.agent_groups import RandomAgentGroup, HeterogeneousAgentGroup, LimitOrderAgentGroup
+from orderbook.order_book import create_order_book
+
+
+def create_simulation(config: dict, rng: np.random.Generator = None):
+    agent_cfg = config['AGENT_GROUP']
+    if 'agents' in agent_cfg:
+        # Several agent classes, the book must be as deep as the largest max_delta 
+        max_delta = max(agent['max_delta'] for agent in agent_cfg['agents'])
+        order_book = create_order_book(config['ORDER_BOOK'], max_delta=max_delta)
+        agent_group = HeterogeneousAgentGroup(order_book, rng=rng, **agent_cfg)
+    elif config['ORDER_BOOK'].get('type') == 'Limit':
+        # Persistent book with matching, cancellations and expiry. Each step depends on the book left by the previous one, 
+        # so it is only stepped by the Step engine, one post_price at a time 
+        simulator_cfg = config.get('SIMULATOR', {})
+        if simulator_cfg.get('engine', 'Step') == 'Block' or simulator_cfg.get('backend') is not None:
+            raise ValueError("ORDER_BOOK.type: Limit only runs on the Step engine without SIMULATOR.backend, "
+                             "use ORDER_BOOK.backend: Numba for the compiled book.")
+        order_book = create_order_book(config['ORDER_BOOK'], max_delta=agent_cfg['max_delta'])
+        agent_group = LimitOrderAgentGroup(order_book, rng=rng, **agent_cfg)
+    else:
+        order_book = create_order_book(config['ORDER_BOOK'], max_delta=agent_cfg['max_delta'])
+        agent_group = RandomAgentGroup(order_book, rng=rng, **agent_cfg)
+    return agent_group
+
+
+def simulate_blocks(agent_group: RandomAgentGroup, simulator_cfg: dict, start: int = 0):
+    # Yields (first step, rounded prices) for consecutive blocks of block_size steps 
+    n_steps = simulator_cfg['n_steps']
+    block_size = simulator_cfg.get('block_size', 100_000)
+    block_engine = simulator_cfg.get('engine', 'Step') == 'Block'
+    # Optional for the Step engine: steps the book over blocks of draws with the NumPy or the Numba kernel 
+    backend = simulator_cfg.get('backend', None)
+
+    for block_start in range(start, n_steps, block_size):
+        n_block = min(block_size, n_steps - block_start)
+        if block_engine:
+            # each price path block is a single cumulative sum 
+            prices = np.round(agent_group.post_prices(n_block), 2)
+        elif backend is not None:
+            prices = np.round(agent_group.post_book_prices(n_block, backend), 2)
+        else:
+            prices = np.array([round(agent_group.post_price(), 2) for _ in range(n_block)])
+        yield block_start, prices
@@ -0,0 +1,85 @@
+import os
+import numpy as np
+import pytest
+import yaml
+
+from simulation.simulator import create_simulation
+
+from orderbook.limit_order_book import LimitOrderBook
+from orderbook.array_limit_order_book import ArrayLimitOrderBook
+
+
+def random_events(n_events: int, seed: int):
+    # Submits around level 200 (part of them marketable), market orders, cancels of earlier order ids and clock steps 
+    rng = np.random.default_rng(seed)
+    kinds = rng.choice(4, size=n_events, p=[0.6, 0.2, 0.05, 0.15])
+    sides = rng.integers(0, 2, size=n_events)
+    offsets = rng.poisson(2.0, size=n_events) - 1
+    levels = np.where(sides == 0, 200 - offsets, 200 + offsets) + np.cumsum(rng.integers(-1, 2, size=n_events)) // 50
+    sizes = rng.negative_binomial(2, 0.2, size=n_events)
+    order_ids = (rng.random(n_events) * np.arange(n_events) / 2).astype(np.int64)
+    return zip(kinds.tolist(), sides.tolist(), levels.tolist(), sizes.tolist(), order_ids.tolist())
+
+
+@pytest.mark.parametrize("ttl", [None, 20])
+def test_array_book_matches_limit_order_book(ttl: int):
+    book = LimitOrderBook(tick_size=0.5, starting_price=100.0, ttl=ttl)
+    # Small arrays, so the levels are widened and the order rows reused or added along the way 
+    array_book = ArrayLimitOrderBook(tick_size=0.5, starting_price=100.0, ttl=ttl, n_orders=64, n_levels=8)
+
+    for kind, side, level, size, order_id in random_events(20_000, seed=ttl or 0):
+        if kind == 0:
+            assert book.submit(side, level, size) == array_book.submit(side, level, size)
+        elif kind == 1:
+            assert book.cancel(order_id) == array_book.cancel(order_id)
+        elif kind == 2:
+            book.step()
+            array_book.step()
+        else:
+            assert book.market(side, size) == array_book.market(side, size)
+
+        assert book.best_level(0) == array_book.best_level(0)
+        assert book.best_level(1) == array_book.best_level(1)
+        assert book.microprice() == array_book.microprice()
+    assert book.traded_volume == array_book.traded_volume > 0
+
+
+def limit_config():
+    with open(os.path.join(os.path.dirname(__file__), "..", "cfg", "simulate_limit_config.yaml"), "r") as file:
+        return yaml.safe_load(file)
+
+
+def test_limit_simulation_trades():
+    # Market orders of cfg/simulate_limit_config.yaml cross the spread, and both backends give the same path 
+    config = limit_config()
+
+    paths = []
+    for backend in ["Python", "Numba"]:
+        config["ORDER_BOOK"]["backend"] = backend
+        agent_group = create_simulation(config)
+        paths.append(agent_group.post_prices(500))
+        assert agent_group.order_book.traded_volume > 0
+    assert np.array_equal(paths[0], paths[1])
+
+
+
+def test_limit_simulation_price_moves():
+    # Cancels and market orders consume the depth at the best levels, so the price leaves its start instead of 
+    # flickering between the two levels around it 
+    config = limit_config()
+    agent_group = create_simulation(config)
+    prices = np.round(agent_group.post_prices(10_000), 2)
+    assert np.abs(prices - config["ORDER_BOOK"]["starting_price"]).max() >= 2 * config["ORDER_BOOK"]["tick_size"]
+    assert np.unique(prices).size > 100
+
+
+@pytest.mark.parametrize("simulator_cfg", [{"engine": "Block"}, {"backend": "Numba"}, {"backend": "NumPy"}])
+def test_limit_simulation_rejects_block_engines(simulator_cfg: dict):
+    config = limit_config()
+    config["SIMULATOR"].update(simulator_cfg)
+    with pytest.raises(ValueError):
+        create_simulation(config)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
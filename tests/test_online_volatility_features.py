@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from features.features import VolatilityFeatures, OnlineVolatilityFeatures
+
+
+def replayed_prices(n_rows: int, seed: int = 1337):
+    # Random walk of minute bar prices around 100 
+    rng = np.random.default_rng(seed)
+    price = 100 * np.exp(np.cumsum(rng.normal(0, 1e-3, size=n_rows)))
+    return pd.DataFrame({"t": np.arange(n_rows), "price": price})
+
+
+@pytest.mark.parametrize("lag, horizon", [(4, 10), (2, 3), (4, 60), (1, 1), (3, 7)])
+def test_online_features_match_batch(lag: int, horizon: int):
+    data = replayed_prices(3 * lag * horizon + 500)
+    batch = VolatilityFeatures().make_features(data.copy(), lag=lag, horizon=horizon)
+    online = OnlineVolatilityFeatures(lag, horizon).make_features(data)
+
+    # The online features start earlier, every row the batch keeps must be identical 
+    assert len(batch) > 0
+    assert batch.index.isin(online.index).all()
+    online = online.loc[batch.index]
+    for column in online.columns:
+        assert np.array_equal(online[column].to_numpy(), batch[column].to_numpy()), column
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,75 @@
+import warnings
+import numpy as np
+import pytest
+
+from models.model import create_model
+
+ALGORITHMS = [
+    ("AR1", {"trend": "c"}),
+    ("ARMA", {"p": 1, "q": 1}),
+    ("ARIMA", {"p": 2, "d": 1, "q": 1, "trend": "t"}),
+    ("GARCH", {"p": 1, "q": 1, "mean": "Constant", "vol": "GARCH", "dist": "normal"}),
+]
+
+
+def series(n_rows: int = 1_200, seed: int = 1337):
+    # Standardized forward rolling volatility, like the target of VolatilityFeatures
+    rng = np.random.default_rng(seed)
+    returns = rng.standard_normal(n_rows + 10) * np.exp(np.cumsum(rng.normal(0, 0.05, size=n_rows + 10)))
+    target = np.sqrt(np.convolve(returns ** 2, np.ones(10), mode="valid")[1:])
+    return ((target - target.mean()) / target.std()).reshape(-1, 1)
+
+
+def fitted_model(algorithm_name: str, hyperparameters: dict, horizon: int, y_train: np.ndarray):
+    model = create_model(algorithm_name, dict(hyperparameters), one_step=True, horizon=horizon)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        model.train(None, y_train)
+    return model
+
+
+@pytest.mark.parametrize("horizon", [1, 5])
+@pytest.mark.parametrize("algorithm_name, hyperparameters", ALGORITHMS)
+def test_walk_forward_only_uses_targets_horizon_steps_back(algorithm_name: str, hyperparameters: dict, horizon: int):
+    y = series()
+    y_train, y_test = y[:1_000], y[1_000:]
+    model = fitted_model(algorithm_name, hyperparameters, horizon, y_train)
+    y_hat = model.walk_forward(None, y_test)
+    assert y_hat.shape == y_test.shape and np.isfinite(y_hat).all()
+
+    # The forecast of test point i may only use the targets up to i - horizon, so changing the targets from cut on
+    # leaves the forecasts before cut + horizon unchanged
+    rng = np.random.default_rng(0)
+    for cut in (0, 37, 120):
+        shuffled = y_test.copy()
+        shuffled[cut:] = rng.permutation(shuffled[cut:])
+        zeroed = y_test.copy()
+        zeroed[cut:] = 0
+        for changed in (shuffled, zeroed):
+            np.testing.assert_allclose(model.walk_forward(None, changed)[:cut + horizon], y_hat[:cut + horizon], rtol=1e-9, atol=1e-12)
+
+
+@pytest.mark.parametrize("algorithm_name, hyperparameters", ALGORITHMS)
+def test_walk_forward_one_step_is_the_filtered_forecast(algorithm_name: str, hyperparameters: dict):
+    # With a horizon of 1, the forecast of each test point is the model's one step ahead prediction given the targets before it
+    y = series()
+    y_train, y_test = y[:1_000], y[1_000:]
+    model = fitted_model(algorithm_name, hyperparameters, 1, y_train)
+    if algorithm_name == "GARCH":
+        from arch.univariate import arch_model
+        fixed = arch_model(y.reshape(-1), **hyperparameters).fix(model.fitted_model.params)
+        expected = fixed.conditional_volatility[1_000:] ** 2
+    else:
+        fitted = model.model if algorithm_name == "ARMA" else model.fitted_model
+        expected = fitted.extend(y_test.reshape(-1)).predict()
+    np.testing.assert_allclose(model.walk_forward(None, y_test).reshape(-1), expected, rtol=1e-9, atol=1e-12)
+
+
+@pytest.mark.parametrize("algorithm_name", ["XGBoost", "Linear Regression", "Decision Tree", "Persistent"])
+def test_one_step_rejects_unsupported_models(algorithm_name: str):
+    with pytest.raises(ValueError):
+        create_model(algorithm_name, {}, one_step=True)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,60 @@
+import warnings
+import numpy as np
+import pandas as pd
+import pytest
+
+from datasets.cross_validation import TimeSeriesFold
+from models.model import create_model
+from models.training import PreparedFolds, train_fold
+
+
+def fold_data(n_rows: int = 3_000, garch: bool = False, seed: int = 1337):
+    # ARMA(1, 1) or GARCH(1, 1) series whose scale grows over time, so the target scaler of every fold is different
+    rng = np.random.default_rng(seed)
+    noise = rng.standard_normal(n_rows)
+    y = np.zeros(n_rows)
+    if garch:
+        variance = 1.0
+        for i in range(1, n_rows):
+            variance = 0.1 + 0.1 * y[i - 1] ** 2 + 0.8 * variance
+            y[i] = np.sqrt(variance) * noise[i]
+    else:
+        for i in range(1, n_rows):
+            y[i] = 0.6 * y[i - 1] + noise[i] + 0.3 * noise[i - 1]
+    y = 0.01 + 1e-3 * np.linspace(1, 4, n_rows) * y
+    data_target = pd.DataFrame({"target": y})
+    data_features = pd.DataFrame({"t": np.arange(n_rows, dtype=float)})
+    train_indices, test_indices = TimeSeriesFold(data_features, data_target, n_splits=5).split()
+    return PreparedFolds(data_features, data_target, train_indices, test_indices, {"FEATURES": ["StandardScaler"], "TARGET": ["StandardScaler"]})
+
+
+def log_likelihood(model):
+    fitted = model.model if model.__class__.__name__ == "ARMA" else model.fitted_model
+    return fitted.loglikelihood if hasattr(fitted, "loglikelihood") else fitted.llf
+
+
+@pytest.mark.parametrize("algorithm_name, hyperparameters", [
+    ("AR1", {"trend": "c"}),
+    ("ARMA", {"p": 1, "q": 1}),
+    ("ARIMA", {"p": 1, "d": 0, "q": 1, "trend": "c"}),
+    ("GARCH", {"p": 1, "q": 1, "mean": "Constant", "vol": "GARCH", "dist": "normal"}),
+    ("GARCH", {"p": 1, "q": 1, "mean": "Zero", "vol": "GARCH", "dist": "t"}),
+])
+def test_warm_start_matches_cold_fits(algorithm_name: str, hyperparameters: dict):
+    folds = fold_data(garch=algorithm_name == "GARCH")
+    cold = create_model(algorithm_name, dict(hyperparameters))
+    warm = create_model(algorithm_name, dict(hyperparameters), warm_start=True)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for fold_idx in range(len(folds)):
+            cold_y_hat, _, _ = train_fold(cold, folds[fold_idx])
+            warm_y_hat, _, _ = train_fold(warm, folds[fold_idx])
+
+            # Warm starts only change where the optimizer starts, so both fits reach the same optimum
+            assert log_likelihood(warm) == pytest.approx(log_likelihood(cold), abs=1e-3)
+            np.testing.assert_allclose(warm_y_hat, cold_y_hat, rtol=1e-3, atol=1e-3 * np.abs(cold_y_hat).max())
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
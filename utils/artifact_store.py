@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import pickle
+import queue
+import threading
+import zlib
+
+ARTIFACTS_DIR = "artifacts"
+MANIFEST_FILE = "manifest.jsonl"
+
+
+def artifact_path(folder_path: str, digest: str):
+    return os.path.join(folder_path, ARTIFACTS_DIR, digest + ".pkl.z")
+
+
+class ArtifactStore():
+    # Saves the models and preprocessing of a run off the training loop: objects are queued as they are, and a background 
+    # thread pickles, hashes, compresses and writes them, so saved objects must not be modified afterwards. 
+    # Artifacts are named by the sha256 of their pickle, 
+    # so identical preprocessing or models are written once, and manifest.jsonl maps each (algorithm, hyperparameters, fold) 
+    # to the hashes of its artifacts. A manifest line is only written once all its artifacts are on disk. 
+    def __init__(self, folder_path: str, compression_level: int = 1, max_pending: int = 64):
+        self.folder_path = folder_path
+        self.compression_level = compression_level
+        os.makedirs(os.path.join(folder_path, ARTIFACTS_DIR), exist_ok=True)
+
+        self.written = set(name[:-len(".pkl.z")] for name in os.listdir(os.path.join(folder_path, ARTIFACTS_DIR)) if name.endswith(".pkl.z"))
+        # Bounded, so the training loop waits instead of holding every pending object in memory 
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.error = None
+        self.thread = threading.Thread(target=self.write_loop, daemon=True)
+        self.thread.start()
+
+    def save(self, algorithm_name: str, hyperparameters: dict, fold: int, **artifacts):
+        # artifacts are named objects, e.g. model, feat_prep and target_prep 
+        if self.error is not None:
+            raise self.error
+        record = {"algorithm": algorithm_name, "hyperparameters": hyperparameters, "fold": fold}
+        self.queue.put((record, artifacts))
+
+    def write_loop(self):
+        with open(os.path.join(self.folder_path, MANIFEST_FILE), "a") as manifest:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    return
+                if self.error is not None:
+                    continue
+                try:
+                    record, artifacts = item
+                    record["artifacts"] = {name: self.write(pickle.dumps(artifact, protocol=pickle.HIGHEST_PROTOCOL))
+                                           for name, artifact in artifacts.items()}
+                    manifest.write(json.dumps(record, default=str) + "\n")
+                    manifest.flush()
+                except Exception as error:
+                    self.error = error
+
+    def write(self, content: bytes):
+        digest = hashlib.sha256(content).hexdigest()
+        if digest not in self.written:
+            path = artifact_path(self.folder_path, digest)
+            # Written next to the artifact then renamed, so a crash never leaves a partial artifact 
+            with open(path + ".tmp", "wb") as file:
+                file.write(zlib.compress(content, self.compression_level))
+            os.replace(path + ".tmp", path)
+            self.written.add(digest)
+        return digest
+
+    def close(self):
+        # Waits for the pending artifacts to be written 
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+def load_artifact(folder_path: str, digest: str):
+    with open(artifact_path(folder_path, digest), "rb") as file:
+        return pickle.loads(zlib.decompress(file.read()))
+
+
+def read_manifest(folder_path: str):
+    with open(os.path.join(folder_path, MANIFEST_FILE), "r") as file:
+        return [json.loads(line) for line in file]
+
+
+def load_fold_artifacts(folder_path: str, algorithm_name: str, hyperparameters: dict, fold: int):
+    # Artifacts saved for a (algorithm, hyperparameters, fold), by name 
+    hyperparameters = json.loads(json.dumps(hyperparameters, default=str))
+    for record in reversed(read_manifest(folder_path)):
+        if record["algorithm"] == algorithm_name and record["hyperparameters"] == hyperparameters and record["fold"] == fold:
+            return {name: load_artifact(folder_path, digest) for name, digest in record["artifacts"].items()}
+    raise KeyError(f"No artifacts for {algorithm_name} {hyperparameters} fold {fold} in {folder_path}.")
@@ -0,0 +1,78 @@
+import argparse
+import numpy as np
+
+
+def minmax_downsample(prices: np.ndarray, n_buckets: int):
+    # Keeps the min and the max of each of n_buckets consecutive buckets, in time order, so the shape of the path 
+    # is preserved at that pixel width. prices is (n_steps,) or (n_paths, n_steps), returns (t, prices) of the same rank. 
+    prices = np.asarray(prices)
+    n_steps = prices.shape[-1]
+    if n_steps <= 2 * n_buckets:
+        # Same shape as prices, so an ensemble has a time axis per path as below 
+        return np.broadcast_to(np.arange(n_steps), prices.shape), np.array(prices)
+
+    bucket_size = -(-n_steps // n_buckets)
+    n_full = n_steps // bucket_size
+    buckets = prices[..., :n_full * bucket_size].reshape(prices.shape[:-1] + (n_full, bucket_size))
+
+    # Index of the min and max in every bucket, ordered by time 
+    offsets = np.arange(n_full) * bucket_size
+    idx = np.sort(np.stack((buckets.argmin(axis=-1), buckets.argmax(axis=-1)), axis=-1), axis=-1)
+    idx = (idx + offsets[:, None]).reshape(idx.shape[:-2] + (-1,))
+
+    if n_full * bucket_size < n_steps:
+        # Last, partial bucket 
+        tail = prices[..., n_full * bucket_size:]
+        tail_idx = np.sort(np.stack((tail.argmin(axis=-1), tail.argmax(axis=-1)), axis=-1), axis=-1) + n_full * bucket_size
+        idx = np.concatenate((idx, tail_idx), axis=-1)
+
+    # For an ensemble, each path has its own min/max positions, so the time axis is per path 
+    return idx, np.take_along_axis(prices, idx, axis=-1)
+
+
+def plot_prices(prices: np.ndarray, output_path: str = None, width: int = 1600, height: int = 600, dpi: int = 100,
+                title: str = "Price Over Time"):
+    # Plots one path or an ensemble of paths from a downsample of `width` buckets, so the cost depends on the pixel 
+    # width rather than on the length of the path. Writes an image when output_path is given, otherwise shows it. 
+    t, downsampled = minmax_downsample(prices, width)
+
+    if output_path is not None:
+        # Non interactive, works on headless nodes 
+        from matplotlib.figure import Figure
+        figure = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+        axis = figure.add_subplot()
+    else:
+        import matplotlib.pyplot as plt
+        figure = plt.figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+        axis = figure.add_subplot()
+
+    if downsampled.ndim == 1:
+        axis.plot(t, downsampled)
+    else:
+        alpha = max(1 / len(downsampled) ** 0.5, 0.05)
+        for path_t, path in zip(t, downsampled):
+            axis.plot(path_t, path, linewidth=0.5, alpha=alpha)
+    axis.set_xlabel('t')
+    axis.set_ylabel('price')
+    axis.set_title(title)
+
+    if output_path is not None:
+        figure.savefig(output_path)
+    else:
+        plt.show()
+
+
+if __name__ == "__main__":
+    from datasets.prices import read_price_array
+
+    parser = argparse.ArgumentParser(
+         prog = "plotting.py",
+         description = "Plots a simulated price path or ensemble."
+    )
+    parser.add_argument("-i", "--input", required=True)
+    parser.add_argument("-o", "--output", default=None)
+    parser.add_argument("--width", type=int, default=1600)
+
+    args = vars(parser.parse_args())
+
+    plot_prices(read_price_array(args["input"]), args["output"], width=args["width"])
@@ -0,0 +1,76 @@
+import json
+import os
+import sqlite3
+
+RESULTS_FILE = "results.sqlite"
+METRICS = ["mean_absolute_error", "mean_squared_error", "max_error", "r2"]
+
+
+def results_path(folder_path: str):
+    return os.path.join(folder_path, RESULTS_FILE)
+
+
+class ResultsStore():
+    # Append-only SQLite store of the cross-validation results of a run, written next to log.txt: 
+    # one row per (algorithm, hyperparameters) evaluation in results, with its mean and standard deviation of each metric, 
+    # and one row per fold in folds. Indexed for the best configuration per algorithm and for the folds of a result. 
+    def __init__(self, path: str, run: str = None):
+        self.run = run
+        self.connection = sqlite3.connect(path)
+        mean_columns = ", ".join(f"{metric} REAL" for metric in METRICS)
+        std_columns = ", ".join(f"std_{metric} REAL" for metric in METRICS)
+        self.connection.executescript(f"""
+            CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY, run TEXT, algorithm TEXT, hyperparameters TEXT, n_folds INTEGER, {mean_columns}, {std_columns});
+            CREATE TABLE IF NOT EXISTS folds (
+                result_id INTEGER REFERENCES results(id), fold INTEGER, {", ".join(f"{metric} REAL" for metric in METRICS)});
+            CREATE INDEX IF NOT EXISTS results_algorithm ON results (algorithm, n_folds DESC, mean_absolute_error);
+            CREATE INDEX IF NOT EXISTS results_metric ON results (mean_absolute_error);
+            CREATE INDEX IF NOT EXISTS folds_result ON folds (result_id, fold);
+        """)
+
+    def add(self, algorithm_name: str, hyperparameters: dict, folds: list, scores: dict, mean: dict, stdev: dict):
+        # folds are the fold numbers, scores the per fold values of each metric in the same order 
+        columns = ["run", "algorithm", "hyperparameters", "n_folds"] + METRICS + [f"std_{metric}" for metric in METRICS]
+        values = [self.run, algorithm_name, json.dumps(hyperparameters, sort_keys=True, default=str), len(folds)]
+        values += [mean[metric] for metric in METRICS] + [stdev[metric] for metric in METRICS]
+        cursor = self.connection.execute(
+            f"INSERT INTO results ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", values)
+
+        rows = [(cursor.lastrowid, fold, *(float(scores[metric][i]) for metric in METRICS)) for i, fold in enumerate(folds)]
+        self.connection.executemany(f"INSERT INTO folds VALUES ({', '.join('?' * (2 + len(METRICS)))})", rows)
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+
+def best_results(path: str):
+    # Best result of each algorithm in a results store: among the results scored on the most folds (successive halving 
+    # also stores results of earlier rounds on fewer folds), the one with the lowest mean_absolute_error. 
+    # Algorithms are in the order they were first stored. 
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return connection.execute("""
+            SELECT id, algorithm, n_folds, mean_absolute_error FROM (
+                SELECT id, algorithm, n_folds, mean_absolute_error,
+                       ROW_NUMBER() OVER (PARTITION BY algorithm ORDER BY n_folds DESC, mean_absolute_error, id) AS position,
+                       MIN(id) OVER (PARTITION BY algorithm) AS first_id
+                FROM results)
+            WHERE position = 1 ORDER BY first_id
+        """).fetchall()
+    finally:
+        connection.close()
+
+
+def fold_results(path: str, result_id: int):
+    # Per fold metrics of a result, by fold number 
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = connection.execute(f"SELECT fold, {', '.join(METRICS)} FROM folds WHERE result_id = ? ORDER BY fold", (result_id,))
+        return [dict(zip(["fold"] + METRICS, row)) for row in rows]
+    finally:
+        connection.close()
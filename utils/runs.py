@@ -1,6 +1,7 @@
 import os
 
-def create_run(config:dict, num_folds:int = 10):
+def create_run(config:dict, num_folds:int = 0):
+    # Fold directories are only created when num_folds is given, saved artifacts go to the run's artifact store 
     folder_name = "run_0"
     if not os.path.exists(config["OUTPUT_DIR"]):
         os.makedirs(config["OUTPUT_DIR"])